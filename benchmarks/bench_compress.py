@@ -0,0 +1,95 @@
+"""GBA BIOS codec throughput and ratio on a large tileset, and LZ77 hash chains vs brute force
+
+Run from the repository root:
+    python benchmarks/bench_compress.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formats import gba_compress  # noqa: E402
+from formats.tile_codec import pack_4bpp  # noqa: E402
+
+
+def lz77_compress_brute(data, vram=True):
+    """Search every position of the window for the longest match, for comparison"""
+    data = bytes(data)
+    n = len(data)
+    out = bytearray(gba_compress._header(gba_compress.TYPE_LZ77, n))
+    flags_at = 0
+    flag_bit = 0
+    pos = 0
+    while pos < n:
+        if not flag_bit:
+            flags_at = len(out)
+            out.append(0)
+            flag_bit = 0x80
+        best_len, best_disp = 2, 0
+        max_len = min(gba_compress.LZ_MAX_MATCH, n - pos)
+        for candidate in range(max(0, pos - gba_compress.LZ_WINDOW), pos - (2 if vram else 1) + 1):
+            length = 0
+            while length < max_len and data[candidate + length] == data[pos + length]:
+                length += 1
+            if length > best_len:
+                best_len, best_disp = length, pos - candidate
+        if best_disp:
+            out[flags_at] |= flag_bit
+            out += bytes(((best_len - 3) << 4 | (best_disp - 1) >> 8, (best_disp - 1) & 0xFF))
+            pos += best_len
+        else:
+            out.append(data[pos])
+            pos += 1
+        flag_bit >>= 1
+    return gba_compress._pad4(out)
+
+
+def make_tileset(tile_count, seed=0):
+    """4bpp tiles drawn from a few dozen motifs with some noise, like typical background art"""
+    random.seed(seed)
+    motifs = [bytes(random.randrange(16) for _ in range(64)) for _ in range(48)]
+    motifs += [bytes([random.randrange(16)]) * 64 for _ in range(8)]
+    tiles = []
+    for _ in range(tile_count):
+        tile = bytearray(random.choice(motifs))
+        for _ in range(random.randrange(8)):
+            tile[random.randrange(64)] = random.randrange(16)
+        tiles.append(bytes(tile))
+    return pack_4bpp(b"".join(tiles))
+
+
+def bench(label, func, data, repeat=3, unpacked_size=None):
+    """Time func(data), reporting throughput in unpacked bytes"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(data)
+    elapsed = (time.perf_counter() - start) / repeat
+    size = unpacked_size or len(data)
+    print(f"  {label:<18} {elapsed * 1000:8.1f} ms {size / elapsed / 1e6:7.2f} MB/s")
+    return result, elapsed
+
+
+def main():
+    data = make_tileset(2048)
+    print(f"tileset: 2048 tiles, {len(data)} bytes of 4bpp data")
+    for codec in gba_compress.CODECS:
+        print(f"{codec}:")
+        stream, _ = bench("compress", lambda d: gba_compress.compress(d, codec), data)
+        unpacked, _ = bench("decompress", gba_compress.decompress, stream, 1, len(data))
+        assert unpacked == data
+        print(f"  ratio {len(stream) / len(data):.3f} ({len(stream)} bytes)")
+
+    codec, stream = gba_compress.compress_smallest(data)
+    print(f"smallest: {codec}, {len(stream)} bytes")
+
+    sample = data[:4096]
+    print(f"LZ77 match finder on {len(sample)} bytes:")
+    fast, chains = bench("hash chains", gba_compress.lz77_compress, sample)
+    brute, brute_force = bench("brute force", lz77_compress_brute, sample, repeat=1)
+    print(f"  speedup {brute_force / chains:.1f}x, {len(fast)} vs {len(brute)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Export time and output size of the C, assembly + binary and binary backends
+
+Every run rewrites all files, except for the last line, which re-exports
+unchanged C output through the manifest.
+
+Run from the repository root:
+    python benchmarks/bench_export.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formats import bin_export, c_export  # noqa: E402
+from formats.export_manifest import ExportManifest  # noqa: E402
+from model.project import Project  # noqa: E402
+from model.tilemap import entry_palbank, make_entry, split_entry  # noqa: E402
+
+
+def export_per_write(project, output_dir):
+    """Tileset and tilemap C arrays written with one call per byte and entry, for comparison"""
+    packed = c_export.tile_set_bytes(project)
+    with open(os.path.join(output_dir, "visual_data.c"), "w") as f:
+        f.write("const u8 tile_set[TILE_COUNT * TILE_SIZE] = \n{\n")
+        for i, byte_val in enumerate(packed):
+            if i % 32 == 0:
+                f.write("    // Tile %d\n    " % (i // 32))
+            f.write("0x%02X, " % byte_val)
+            if i % 32 == 31:
+                f.write("\n")
+        f.write("};\n")
+    tilemap = project.tilemap
+    width, height, _ = c_export.tilemap_layout(tilemap)
+    with open(os.path.join(output_dir, "level.c"), "w") as f:
+        f.write("const u16 tile_map[%d * %d] = \n{\n" % (width, height))
+        for y in range(height):
+            for x in range(width):
+                entry = tilemap.get_entry(x, y)
+                tile_idx, flip_h, flip_v = split_entry(entry)
+                f.write("    TILE_ENTRY(%d, %d, %d, %d)," % (tile_idx, entry_palbank(entry), int(flip_h), int(flip_v)))
+            f.write("\n")
+        f.write("};\n")
+
+
+def export_c(project, manifest):
+    c_export.export_palette_and_tileset(project, manifest.output_dir, manifest=manifest)
+    c_export.export_tilemap(project, os.path.join(manifest.output_dir, "level.c"), manifest=manifest)
+    manifest.save()
+
+
+def export_bin(project, manifest, assembly):
+    bin_export.export_palette_and_tileset(project, manifest.output_dir, assembly=assembly, manifest=manifest)
+    bin_export.export_tilemap(project, os.path.join(manifest.output_dir, "level.c"), assembly=assembly,
+                              manifest=manifest)
+    manifest.save()
+
+
+def make_project(map_size=256, seed=0):
+    """A full 4bpp tileset of noise and a map_size x map_size map of 1024 distinct entries
+
+    Like real levels, the map reuses a limited set of tile, flip and bank combinations.
+    """
+    random.seed(seed)
+    project = Project()
+    tile_count = len(project.tileset)
+    project.tileset.load_bytes(bytes(random.randrange(1, 16) for _ in range(tile_count * 64)))
+    project.tilemap.resize(map_size, map_size)
+    pool = [make_entry(random.randrange(1, tile_count), random.random() < 0.5, random.random() < 0.5,
+                       random.randrange(16)) for _ in range(1024)]
+    entries = [random.choice(pool) for _ in range(map_size * map_size)]
+    project.tilemap.load_entries(entries, map_size)
+    return project
+
+
+def bench(label, export, project, repeat=3, warm=False):
+    """Time export(project, output_dir) into a fresh directory, after one untimed export if warm"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        if warm:
+            export(project, output_dir)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            export(project, output_dir)
+        elapsed = (time.perf_counter() - start) / repeat
+        size = sum(os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir))
+    print(f"{label:<22} {elapsed * 1000:8.1f} ms {size / 1024:9.1f} KB output")
+
+
+def main():
+    project = make_project()
+    print(f"{len(project.tileset)} tiles, {project.tilemap.width}x{project.tilemap.height} map")
+    bench("C, write per value", export_per_write, project)
+    bench("C, rows", lambda p, d: export_c(p, ExportManifest(d, force=True)), project)
+    for output_format in ("asm", "bin"):
+        assembly = output_format == "asm"
+        bench(output_format, lambda p, d: export_bin(p, ExportManifest(d, force=True), assembly), project)
+    bench("C, unchanged", lambda p, d: export_c(p, ExportManifest(d)), project, warm=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Tile image cache-miss latency: per-pixel put calls vs one bulk put + zoom
+
+Needs a display. Run from the repository root:
+    python benchmarks/bench_render.py
+"""
+import os
+import random
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ui.tile_renderer import hex_colors, render_tile  # noqa: E402
+
+
+def render_tile_per_pixel(pixels, palette_colors, scale, size=8, flip_h=False, flip_v=False):
+    """The previous TilemapPane.render_tile_image loop, for comparison"""
+    img = tk.PhotoImage(width=size * scale, height=size * scale)
+    for i, color_index in enumerate(pixels):
+        px = i % size
+        py = i // size
+        if flip_h:
+            px = size - 1 - px
+        if flip_v:
+            py = size - 1 - py
+        color = palette_colors[color_index]
+        hex_color = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
+        img.put(hex_color, to=(px * scale, py * scale, (px + 1) * scale, (py + 1) * scale))
+    return img
+
+
+def bench(label, render, tiles, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for pixels in tiles:
+            render(pixels)
+    elapsed = time.perf_counter() - start
+    per_tile_us = elapsed / (repeat * len(tiles)) * 1e6
+    print(f"{label:<28} {per_tile_us:9.1f} us per cache miss")
+    return per_tile_us
+
+
+def main():
+    root = tk.Tk()
+    root.withdraw()
+
+    random.seed(0)
+    palette = [(random.randrange(256), random.randrange(256), random.randrange(256)) for _ in range(16)]
+    colors = hex_colors(palette)
+    tiles = [bytes(random.randrange(16) for _ in range(64)) for _ in range(64)]
+
+    for scale in (1, 4, 8):
+        print(f"scale {scale}:")
+        before = bench("  per-pixel put", lambda p: render_tile_per_pixel(p, palette, scale), tiles, 3)
+        after = bench("  bulk put + zoom", lambda p: render_tile(p, colors, scale), tiles, 3)
+        print(f"  speedup {before / after:.1f}x")
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
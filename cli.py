@@ -0,0 +1,173 @@
+"""Headless command line entry point (python main.py export ...)"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from formats import bin_export, c_export, gba_compress, gtproj
+from formats.export_manifest import ExportManifest
+from formats.image_import import import_image
+from model.project import Project
+from model.optimize import optimize_tiles
+
+
+def export_project(project_path, output_dir=None, tilemap_name=None, compression=None, output_format="c",
+                   force=False):
+    """Export one project's tileset and tilemap, returning (written files, unchanged files, seconds)
+
+    output_format is one of bin_export.FORMATS: C sources, .bin blobs with
+    .s and .h files, or bare .bin blobs. Files whose content would not
+    change are left alone unless force is set.
+    """
+    start = time.perf_counter()
+    project = gtproj.load_project(project_path)
+
+    name = os.path.splitext(os.path.basename(project_path))[0]
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(project_path))
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = ExportManifest(output_dir, force)
+    tilemap_path = os.path.join(output_dir, (tilemap_name or name) + ".c")
+    if output_format == "c":
+        c_export.export_palette_and_tileset(project, output_dir, compression, manifest)
+        c_export.export_tilemap(project, tilemap_path, compression, manifest)
+    else:
+        assembly = output_format == "asm"
+        bin_export.export_palette_and_tileset(project, output_dir, compression, assembly, manifest)
+        bin_export.export_tilemap(project, tilemap_path, compression, assembly, manifest)
+    manifest.save()
+    return manifest.written, manifest.unchanged, time.perf_counter() - start
+
+
+def _export_job(args):
+    project_path, output_dir, tilemap_name, compression, output_format, force = args
+    try:
+        written, unchanged, elapsed = export_project(project_path, output_dir, tilemap_name, compression,
+                                                     output_format, force)
+        return project_path, written, unchanged, elapsed, None
+    except Exception as e:  # Report and keep going with the other projects
+        return project_path, [], [], 0.0, e
+
+
+def run_export(args):
+    jobs = []
+    owners = {}  # Output directory -> project exported there
+    for project_path in args.projects:
+        output_dir = args.output_dir
+        if len(args.projects) > 1:
+            # One sub-directory per project so visual_data.c files and manifests don't collide
+            name = os.path.splitext(os.path.basename(project_path))[0]
+            parent = output_dir if output_dir is not None else os.path.dirname(os.path.abspath(project_path))
+            output_dir = os.path.join(parent, name)
+        key = os.path.normcase(os.path.abspath(output_dir or os.path.dirname(os.path.abspath(project_path))))
+        if key in owners:
+            print(f"{project_path}: would overwrite the export of {owners[key]} in {key}")
+            return 2
+        owners[key] = project_path
+        jobs.append((project_path, output_dir, args.tilemap_name, args.compress, args.format, args.force))
+
+    start = time.perf_counter()
+    if args.jobs > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(_export_job, jobs))
+    else:
+        results = [_export_job(job) for job in jobs]
+
+    failures = 0
+    for project_path, written, unchanged, elapsed, error in results:
+        if error is not None:
+            failures += 1
+            print(f"{project_path}: FAILED ({error})")
+        else:
+            print(f"{project_path}: {len(written)} files written, {len(unchanged)} unchanged "
+                  f"in {elapsed * 1000:.1f} ms")
+    print(f"Exported {len(results) - failures}/{len(results)} projects "
+          f"in {time.perf_counter() - start:.2f} s")
+    return 1 if failures else 0
+
+
+def run_optimize(args):
+    if args.output and len(args.projects) > 1:
+        print("--output can only be used with a single project")
+        return 2
+
+    for project_path in args.projects:
+        project = gtproj.load_project(project_path)
+        result = optimize_tiles(project)
+        output_path = args.output or project_path
+        if not args.dry_run:
+            gtproj.save_project(project, output_path)
+        print(f"{project_path}: {result}" + ("" if args.dry_run else f" -> {output_path}"))
+    return 0
+
+
+def run_import_image(args):
+    start = time.perf_counter()
+    project = Project()
+    project.tileset.set_bpp(args.bpp)
+    try:
+        result = import_image(project, args.image, dither=args.dither, banks=not args.single_bank)
+    except (OSError, ValueError) as e:  # Unreadable or invalid image
+        print(f"{args.image}: FAILED ({e})")
+        return 1
+    output_path = args.output or os.path.splitext(args.image)[0] + ".gtproj"
+    gtproj.save_project(project, output_path)
+    print(f"{args.image}: {result} -> {output_path} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="gba-tile-maker")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="export .gtproj projects to GBA C sources or binary data")
+    export.add_argument("projects", nargs="+", help=".gtproj files to export")
+    export.add_argument("-o", "--output-dir",
+                        help="output directory (default: next to each project); "
+                             "when exporting several projects, each goes to a sub-directory named after it")
+    export.add_argument("--tilemap-name",
+                        help="base name of the tilemap output files (default: project name)")
+    export.add_argument("--format", choices=bin_export.FORMATS, default="c",
+                        help="c: C sources; asm: .bin blobs with .s (.incbin) and .h files; "
+                             "bin: .bin blobs only (default: c)")
+    export.add_argument("--compress", choices=gba_compress.CODECS + ("smallest",),
+                        help="store tiles and tilemap as GBA BIOS compressed streams; "
+                             "smallest picks the best codec per asset (default: uncompressed)")
+    export.add_argument("-f", "--force", action="store_true",
+                        help="rewrite every file, even those whose content has not changed")
+    export.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes")
+    export.set_defaults(func=run_export)
+
+    optimize = commands.add_parser("optimize",
+                                   help="merge duplicate and mirrored tiles and rewrite the tilemap")
+    optimize.add_argument("projects", nargs="+", help=".gtproj files to optimize (in place by default)")
+    optimize.add_argument("-o", "--output", help="write the optimized project here instead")
+    optimize.add_argument("-n", "--dry-run", action="store_true",
+                          help="only report the savings")
+    optimize.set_defaults(func=run_optimize)
+
+    import_cmd = commands.add_parser("import-image",
+                                     help="convert a PNG background into a .gtproj project")
+    import_cmd.add_argument("image", help="PNG file; images with more than 15 colors use several "
+                            "palette banks, or are quantized if they do not fit")
+    import_cmd.add_argument("--single-bank", action="store_true",
+                            help="quantize to one 15-color bank instead of splitting colors over banks")
+    import_cmd.add_argument("--dither", type=int, default=0,
+                            help="ordered dithering strength when quantizing: the largest color offset "
+                                 "in 5-bit steps (default: off)")
+    import_cmd.add_argument("--bpp", type=int, choices=(4, 8), default=4,
+                            help="tile mode of the project: 8 allows 255 colors without palette banks (default: 4)")
+    import_cmd.add_argument("-o", "--output", help="project to write (default: next to the image)")
+    import_cmd.set_defaults(func=run_import_image)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+"""Background autosave: snapshot on the caller's thread, encode and write on a worker"""
+import queue
+import threading
+import time
+
+
+class AutosaveWorker:
+    """Runs AutosaveJournal.save on a worker thread
+
+    The worker never calls back into the UI: finished saves wait in a queue
+    until the UI thread calls poll(), e.g. from a Tk after() loop, which
+    then calls on_done(result, error) with the journal's result or the
+    exception raised.
+    """
+
+    def __init__(self, journal, on_done=None):
+        self.journal = journal
+        self.on_done = on_done
+        self.busy = False
+        self.last_block_ms = 0.0  # Time the caller's thread spent in the last submit()
+        self.last_write_ms = 0.0  # Time the worker spent encoding and writing
+        self._jobs = queue.Queue()
+        self._done = queue.Queue()  # (project, dirty, result, error, write ms) of finished saves
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def submit(self, project):
+        """Queue a save of the pending changes, returning False if one is still running or nothing changed"""
+        if self.busy:
+            return False  # Changes stay dirty in the model until the next tick
+
+        start = time.perf_counter()
+        dirty = project.take_dirty()
+        if not any(dirty):
+            self.last_block_ms = (time.perf_counter() - start) * 1000
+            return False
+        snapshot = project.copy()
+        self.busy = True
+        self._jobs.put((project, snapshot, dirty))
+        self.last_block_ms = (time.perf_counter() - start) * 1000
+        return True
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            project, snapshot, dirty = job
+            start = time.perf_counter()
+            try:
+                result, error = self.journal.save(snapshot, dirty), None
+            except Exception as e:  # Reported on the UI thread
+                result, error = None, e
+            self._done.put((project, dirty, result, error, (time.perf_counter() - start) * 1000))
+            self._jobs.task_done()
+
+    def poll(self):
+        """Handle finished saves on the calling thread; returns whether a save is still running"""
+        while True:
+            try:
+                project, dirty, result, error, write_ms = self._done.get_nowait()
+            except queue.Empty:
+                return self.busy
+            self.busy = False
+            self.last_write_ms = write_ms
+            if error is not None:
+                project.restore_dirty(dirty)  # Try again on the next tick
+            if self.on_done:
+                self.on_done(result, error)
+
+    def flush(self, project):
+        """Wait for the running save, then save anything still pending on this thread
+
+        The worker needs nothing from the calling thread to finish, so this
+        can block the UI thread.
+        """
+        self._jobs.join()
+        self.poll()
+        return self.journal.save(project)
+
+    def stop(self):
+        self._jobs.put(None)
@@ -0,0 +1,91 @@
+"""Export palette, tileset and tilemap as raw .bin blobs, optionally wrapped in a .s file using .incbin
+
+The headers are the same as the C exporter's, so game code builds
+unchanged against either output. Each blob is written with one call,
+and assembling the .s file only copies the blobs, so large assets need
+no C initializers to be parsed.
+"""
+import io
+import os
+import struct
+
+from formats import export_manifest
+from formats.c_export import (compress_asset, palette_words, tile_set_bytes, tilemap_entries, tilemap_layout,
+                              write_tilemap_header, write_visual_header)
+
+FORMATS = ("c", "asm", "bin")
+
+
+def incbin_source(symbols):
+    """Assembly defining each (symbol, type, .bin file name) with .incbin
+
+    Symbols are 4-byte aligned, which the BIOS decompressors and DMA
+    copies need. The .bin files are referenced by name, so assemble with
+    the output directory on the include path (-I).
+    """
+    lines = ["@ Generated by gba-tile-maker\n", "    .section .rodata\n"]
+    for symbol, ctype, bin_name in symbols:
+        lines += [
+            "\n",
+            "    .global %s\n" % symbol,
+            "    .type %s, %%object\n" % symbol,
+            "    .balign 4\n",
+            "%s:  @ %s\n" % (symbol, ctype),
+            "    .incbin \"%s\"\n" % bin_name,
+            "    .size %s, . - %s\n" % (symbol, symbol),
+        ]
+    return "".join(lines)
+
+
+def export_palette_and_tileset(project, output_dir, compression=None, assembly=True, manifest=None):
+    """Export palette.bin and tile_set.bin, plus visual_data.s and visual_data.h if assembly is set
+
+    compression and manifest work as for c_export.export_palette_and_tileset.
+    """
+    paths = [os.path.join(output_dir, "palette.bin"), os.path.join(output_dir, "tile_set.bin")]
+    if assembly:
+        paths += [os.path.join(output_dir, "visual_data.s"), os.path.join(output_dir, "visual_data.h")]
+    return export_manifest.export(manifest, output_dir, paths,
+                                  export_manifest.project_hash(project, "bin", compression, assembly),
+                                  lambda: _visual_data_outputs(project, compression))
+
+
+def _visual_data_outputs(project, compression):
+    """Return the palette and tile blobs, then the text of visual_data.s and visual_data.h"""
+    colors = palette_words(project)
+    packed = tile_set_bytes(project)
+    stream = compress_asset(packed, compression) if compression else None
+    with io.StringIO() as f:
+        write_visual_header(f, project, stream)
+        header = f.getvalue()
+    return [struct.pack("<%dH" % len(colors), *colors), packed if stream is None else stream,
+            incbin_source([("palette", "u16", "palette.bin"), ("tile_set", "u8", "tile_set.bin")]), header]
+
+
+def export_tilemap(project, output_path, compression=None, assembly=True, manifest=None):
+    """Export the used map area as little-endian u16 entries to output_path's .bin file
+
+    With assembly set, a .s file defining tile_map and a .h header are
+    written next to it. compression and manifest work as for
+    c_export.export_tilemap.
+    """
+    base_path = os.path.splitext(output_path)[0]
+    paths = [base_path + ".bin"]
+    if assembly:
+        paths += [base_path + ".s", base_path + ".h"]
+    return export_manifest.export(manifest, os.path.dirname(output_path) or os.curdir, paths,
+                                  export_manifest.project_hash(project, "bin", compression, assembly),
+                                  lambda: _tilemap_outputs(project, os.path.basename(base_path), compression))
+
+
+def _tilemap_outputs(project, name, compression):
+    """Return the tilemap blob, then the text of its .s and .h files"""
+    map_width, map_height, last_used_tile = tilemap_layout(project.tilemap)
+    entries = tilemap_entries(project.tilemap, map_width, map_height)
+    unpacked = struct.pack("<%dH" % len(entries), *entries)
+    stream = compress_asset(unpacked, compression) if compression else None
+    with io.StringIO() as f:
+        write_tilemap_header(f, name, map_width, map_height, last_used_tile, stream)
+        header = f.getvalue()
+    return [unpacked if stream is None else stream,
+            incbin_source([("tile_map", "u16" if stream is None else "u8", name + ".bin")]), header]
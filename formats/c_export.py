@@ -0,0 +1,245 @@
+import io
+import os
+import struct
+
+from formats import export_manifest, gba_compress
+from formats.tile_codec import pack_4bpp
+from model.palette import PALETTE_SIZE
+from model.tilemap import entry_palbank, split_entry
+from model.tileset import TILE_SIZE, TILE_PIXELS
+
+
+def used_bank_count(project):
+    """Number of palette banks to export: up to the last bank with colors or used by the map
+
+    8bpp tiles index the whole palette, so it is always exported in full.
+    """
+    if project.tileset.bpp == 8:
+        return len(project.palette) // PALETTE_SIZE
+    return max([project.palette.last_used_bank()] + list(project.tilemap.used_palbanks())) + 1
+
+
+def compress_asset(data, compression):
+    """Compress data with a codec from gba_compress.CODECS, or "smallest" to try them all"""
+    if compression == "smallest":
+        return gba_compress.compress_smallest(data)[1]
+    return gba_compress.compress(data, compression)
+
+
+def palette_words(project):
+    """15-bit colors of the palette banks to export"""
+    return [project.palette.get_gba(i) for i in range(used_bank_count(project) * PALETTE_SIZE)]
+
+
+def tile_set_bytes(project):
+    """Tile data up to the last non-empty tile, packed as the GBA reads it"""
+    tileset = project.tileset
+    used = tileset.data[:(tileset.last_non_empty() + 1) * TILE_PIXELS]
+    if tileset.bpp == 8:
+        return bytes(used)  # The tile buffer already holds one byte per pixel
+    # Pack 2 pixels per byte (right then left) for the whole tileset at once
+    return pack_4bpp(used)
+
+
+def tilemap_layout(tilemap):
+    """Return (width, height, last used tile) of the map area to export, at least 1x1"""
+    # Find used tiles and boundaries (only non-zero tiles count), from chunk metadata
+    max_x, max_y = tilemap.used_bounds() or (0, 0)
+    used_tiles = tilemap.used_tiles()
+    # Adjust dimensions (add 1 because we want count, not index)
+    map_width = max_x + 1 if max_x > 0 else 1  # Minimum 1x1
+    map_height = max_y + 1 if max_y > 0 else 1
+    return map_width, map_height, max(used_tiles) if used_tiles else 0
+
+
+def tilemap_entries(tilemap, width, height):
+    """Screen entries of the top-left width x height cells, row by row"""
+    entries = []
+    for y in range(height):
+        entries.extend(tilemap.get_row(y)[:width])
+    return entries
+
+
+class _EntryText(dict):
+    """Screen entry -> its TILE_ENTRY(...) initializer, formatted on first lookup
+
+    Maps repeat a few entries many times, so rows are joined from this
+    dict at C speed and each distinct entry is formatted once.
+    """
+
+    def __missing__(self, entry):
+        tile_idx, flip_h, flip_v = split_entry(entry)
+        text = self[entry] = "    TILE_ENTRY(%d, %d, %d, %d)," % (tile_idx, entry_palbank(entry), int(flip_h), int(flip_v))
+        return text
+
+
+def write_compressed_array(f, name, stream, unpacked_size):
+    """Write a compressed stream as a 4-byte aligned u8 array, as the BIOS decompressors require"""
+    f.write("// %s compressed, %d bytes unpacked\n" % (gba_compress.stream_codec(stream), unpacked_size))
+    f.write("const u8 %s[%d] __attribute__((aligned(4))) = \n{\n" % (name, len(stream)))
+    rows = []
+    for start in range(0, len(stream), 16):
+        row = stream[start:start + 16]
+        rows.append("    " + "0x%02X, " * len(row) % tuple(row) + "\n")
+    f.write("".join(rows))
+    f.write("};\n")
+
+
+def write_visual_header(f, project, stream=None):
+    """Write visual_data.h, declaring palette and tile_set with the defines game code uses
+
+    stream is the compressed tile data, if any. Shared by the C and binary exporters.
+    """
+    tileset = project.tileset
+    color_count = used_bank_count(project) * PALETTE_SIZE
+    f.write("#ifndef VISUAL_DATA_H\n")
+    f.write("#define VISUAL_DATA_H\n\n")
+    f.write("#include \"visual.h\"\n\n")
+    f.write("\n#define PALETTE_COUNT %d\n" % color_count)
+    f.write("#define TILE_COUNT %d\n" % (tileset.last_non_empty() + 1))
+    # 8bpp headers give the bytes per tile, which tile_set is sized by
+    f.write("#define TILE_SIZE %d\n" % (tileset.tile_bytes if tileset.bpp == 8 else TILE_SIZE))
+    f.write("extern const u16 palette[%d];\n" % color_count)
+    if stream is None:
+        f.write("extern const u8 tile_set[TILE_COUNT * TILE_SIZE];\n")
+    else:
+        # BIOS header type: 0x10 LZ77, 0x24/0x28 Huffman, 0x30 run-length
+        f.write("#define TILE_SET_COMPRESSION 0x%02X\n" % stream[0])
+        f.write("extern const u8 tile_set[%d];\n" % len(stream))
+    f.write("#endif")
+
+
+def write_tilemap_header(f, name, map_width, map_height, last_used_tile, stream=None):
+    """Write a tilemap header declaring tile_map and its size; shared by the C and binary exporters"""
+    f.write("#ifndef %s_H\n" % name.upper())
+    f.write("#define %s_H\n\n" % name.upper())
+    f.write("#include \"visual.h\"\n\n")
+    if stream is None:
+        f.write("extern const u16 tile_map[%d * %d];\n" % (map_width, map_height))
+    else:
+        f.write("#define TILE_MAP_COMPRESSION 0x%02X\n" % stream[0])
+        f.write("extern const u8 tile_map[%d];\n" % len(stream))
+    f.write("\n#define TILE_MAP_WIDTH %d\n" % map_width)
+    f.write("#define TILE_MAP_HEIGHT %d\n" % map_height)
+    f.write("#define LAST_USED_TILE %d\n" % last_used_tile)
+    f.write("#endif")
+
+
+def export_palette_and_tileset(project, output_dir, compression=None, manifest=None):
+    """Export palette and tileset to GBA-compatible C files, only including non-empty tiles
+
+    compression names a codec of gba_compress.CODECS or "smallest" to store
+    the tiles as a BIOS-compatible stream; the palette stays uncompressed.
+    Files already holding the same content are not rewritten, see
+    export_manifest.export for manifest.
+    """
+    palette_path = os.path.join(output_dir, "visual_data.c")
+    header_path = os.path.join(output_dir, "visual_data.h")
+    return export_manifest.export(manifest, output_dir, [palette_path, header_path],
+                                  export_manifest.project_hash(project, "c", compression),
+                                  lambda: _visual_data_sources(project, compression))
+
+
+def _visual_data_sources(project, compression):
+    """Return the text of visual_data.c and visual_data.h"""
+    tileset = project.tileset
+
+    # Find last non-empty tile
+    last_non_empty = tileset.last_non_empty()
+    
+    # Export palette (all 16 colors of every bank in use, or all 256 for 8bpp tiles)
+    colors = palette_words(project)
+    color_count = len(colors)
+    eight_bpp = tileset.bpp == 8
+    with io.StringIO() as f:
+        f.write("#include \"visual_data.h\"\n\n")
+        f.write("// Palette data\n")
+        f.write("const u16 palette[%d] = \n{\n" % color_count)
+        
+        # First color is transparent
+        lines = ["    0x%04X, // Transparent\n" % colors[0]]
+        
+        # Remaining colors
+        for i in range(1, color_count):
+            bank, color = divmod(i, PALETTE_SIZE)
+            if bank == 0 or eight_bpp:
+                lines.append("    0x%04X, // Color %d\n" % (colors[i], i))
+            else:
+                lines.append("    0x%04X, // Bank %d color %d\n" % (colors[i], bank, color))
+        f.write("".join(lines))
+        f.write("};\n\n")
+        
+        # Export tileset (only up to last non-empty tile)
+        packed = tile_set_bytes(project)
+        tile_bytes = tileset.tile_bytes
+
+        if eight_bpp:
+            f.write("// Tileset data (each byte = 1 pixel)\n")
+        else:
+            f.write("// Tileset data (each byte = 2 pixels, right then left)\n")
+        stream = None
+        if compression:
+            stream = compress_asset(packed, compression)
+            write_compressed_array(f, "tile_set", stream, len(packed))
+        else:
+            f.write("const u8 tile_set[TILE_COUNT * TILE_SIZE] = \n{\n")
+            row_format = "    // Tile %d\n    " + "0x%02X, " * tile_bytes + "\n"
+            f.write("".join(row_format % ((tile_idx,) + tuple(packed[tile_idx * tile_bytes:(tile_idx + 1) * tile_bytes]))
+                            for tile_idx in range(last_non_empty + 1)))
+            
+            f.write("};\n")
+        source = f.getvalue()
+    
+    # Create header file
+    with io.StringIO() as f:
+        write_visual_header(f, project, stream)
+        header = f.getvalue()
+
+    return [source, header]
+
+
+def export_tilemap(project, output_path, compression=None, manifest=None):
+    """Export tilemap to GBA-compatible C file, only including used area
+
+    compression and manifest work as for export_palette_and_tileset,
+    compressing the screen entries as little-endian u16.
+    """
+    header_path = os.path.splitext(output_path)[0] + ".h"
+    return export_manifest.export(manifest, os.path.dirname(output_path) or os.curdir, [output_path, header_path],
+                                  export_manifest.project_hash(project, "c", compression),
+                                  lambda: _tilemap_sources(project, output_path, compression))
+
+
+def _tilemap_sources(project, output_path, compression):
+    """Return the text of the tilemap .c and .h files"""
+    name = os.path.splitext(os.path.basename(output_path))[0]
+    
+    tilemap = project.tilemap
+    map_width, map_height, last_used_tile = tilemap_layout(tilemap)
+    entries = tilemap_entries(tilemap, map_width, map_height)
+    
+    # Write tilemap C file
+    with io.StringIO() as f:
+        f.write("#include \"%s.h\"\n\n" % name)
+        f.write("// Tilemap data\n")
+        stream = None
+        if compression:
+            unpacked = struct.pack("<%dH" % len(entries), *entries)
+            stream = compress_asset(unpacked, compression)
+            write_compressed_array(f, "tile_map", stream, len(unpacked))
+        else:
+            f.write("const u16 tile_map[%d * %d] = \n{\n" % (map_width, map_height))
+            
+            entry_text = _EntryText()
+            f.write("".join("".join(map(entry_text.__getitem__, entries[start:start + map_width])) + "\n"
+                            for start in range(0, len(entries), map_width)))
+            
+            f.write("};\n")
+        source = f.getvalue()
+    
+    # Write tilemap header file
+    with io.StringIO() as f:
+        write_tilemap_header(f, name, map_width, map_height, last_used_tile, stream)
+        header = f.getvalue()
+
+    return [source, header]
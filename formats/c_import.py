@@ -0,0 +1,157 @@
+"""Memory-mapped parser for the C arrays written by formats.c_export"""
+import mmap
+import os
+import re
+import sys
+from array import array
+
+from formats import gba_compress
+from model.tilemap import make_entry
+from model.tileset import TILE_PIXELS
+
+# Declaration like "const u8 tile_set[TILE_COUNT * TILE_SIZE] = {", optionally with an attribute before "="
+_DECLARATION = re.compile(rb"(?:const\s+)?(\w+)\s+(\w+)\s*\[([^\]]*)\]\s*(__attribute__\s*\(\(.*?\)\))?\s*=\s*\{")
+
+# Comments match without a capture and come back as empty strings to be dropped
+_TOKEN = re.compile(
+    rb"//[^\n]*|/\*.*?\*/"
+    rb"|(0[xX][0-9A-Fa-f]+|TILE_ENTRY\s*\([^)]*\)|\d+)",
+    re.DOTALL
+)
+
+# Element typecodes for the C types the exporters use
+_TYPECODES = {
+    b"u8": "B", b"uint8_t": "B", b"char": "B",
+    b"u16": "H", b"uint16_t": "H", b"short": "H",
+    b"u32": "I", b"uint32_t": "I", b"int": "I",
+}
+
+
+class CArray:
+    """A named array parsed from a C source file"""
+
+    def __init__(self, ctype, name, dims, values, attribute=None):
+        self.ctype = ctype
+        self.name = name
+        self.dims = dims  # Literal sizes from the declaration, e.g. [32, 20] for "32 * 20"
+        self.values = values
+        self.attribute = attribute  # e.g. "__attribute__((aligned(4)))"
+
+    @property
+    def compressed(self):
+        """Whether this is a BIOS compressed stream, which the exporters write as aligned u8 arrays"""
+        return self.ctype == "u8" and self.attribute is not None and "aligned" in self.attribute
+
+    def __len__(self):
+        return len(self.values)
+
+
+def _decode_body(mm, start, end, typecode):
+    tokens = list(filter(None, _TOKEN.findall(mm, start, end)))
+    itemsize = array(typecode).itemsize
+
+    # Fast path: every literal is a fixed-width hex value, decode them all in one call
+    if all(len(t) == 2 + itemsize * 2 for t in tokens):
+        digits = b"".join(tokens)
+        if digits.count(b"0x") + digits.count(b"0X") == len(tokens):
+            digits = digits.replace(b"0x", b"").replace(b"0X", b"")
+            values = array(typecode, bytes.fromhex(digits.decode("ascii")))
+            if itemsize > 1 and sys.byteorder == "little":
+                values.byteswap()
+            return values
+
+    values = array(typecode)
+    for token in tokens:
+        if token.startswith(b"TILE_ENTRY"):
+            args = token[token.index(b"(") + 1:-1].split(b",")
+            tile_index, palbank, flip_h, flip_v = (int(a, 0) for a in args)
+            values.append(make_entry(tile_index, flip_h, flip_v, palbank))
+        else:
+            values.append(int(token, 0))
+    return values
+
+
+def parse_arrays(path, names=None):
+    """Return {name: CArray} for the initialized arrays in a C file, optionally only those in names"""
+    arrays = {}
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return arrays
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            while True:
+                match = _DECLARATION.search(mm, pos)
+                if not match:
+                    break
+                body_end = mm.find(b"}", match.end())
+                if body_end < 0:
+                    break
+                pos = body_end + 1
+
+                ctype, name, dims = match.group(1), match.group(2).decode("ascii"), match.group(3)
+                if names is not None and name not in names:
+                    continue
+                typecode = _TYPECODES.get(ctype, "H")
+                dims = [int(d) for d in re.findall(rb"\d+", dims)]
+                attribute = match.group(4) and match.group(4).decode("ascii")
+                arrays[name] = CArray(ctype.decode("ascii"), name, dims,
+                                      _decode_body(mm, match.end(), body_end, typecode), attribute)
+    return arrays
+
+
+def read_visual_data(path):
+    """Return (15-bit palette values, tile bytes as exported, bits per pixel) from a visual_data.c file
+
+    Tile bytes are packed 4bpp or one byte per pixel, as the file's tile
+    mode says, which comes from the TILE_SIZE of its header.
+    """
+    arrays = parse_arrays(path, {"palette", "tile_set"})
+    if "palette" not in arrays:
+        raise ValueError("no palette array in %s" % path)
+    if "tile_set" not in arrays:
+        raise ValueError("no tile_set array in %s" % path)
+    tile_set = arrays["tile_set"]
+    tile_bytes = tile_set.values.tobytes()
+    if tile_set.compressed:
+        tile_bytes = gba_compress.decompress(tile_bytes)
+    return list(arrays["palette"].values), tile_bytes, _visual_data_bpp(path)
+
+
+def _visual_data_bpp(path):
+    """Tile mode of an exported visual_data.c: 8bpp headers define TILE_SIZE as the 64 bytes of a tile"""
+    try:
+        return 8 if _header_define(path, b"TILE_SIZE") == TILE_PIXELS else 4
+    except ValueError:
+        pass
+    # No header to go by: the exporter's comment above tile_set names the layout
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return 8 if mm.find(b"each byte = 1 pixel") >= 0 else 4
+
+
+def read_tilemap(path, name="tile_map"):
+    """Return (width, screen entries) from a tilemap .c file written by export_tilemap"""
+    arrays = parse_arrays(path, {name})
+    if name not in arrays:
+        raise ValueError("no %s array in %s" % (name, path))
+    tile_map = arrays[name]
+    if tile_map.compressed:
+        entries = array("H")
+        entries.frombytes(gba_compress.decompress(tile_map.values.tobytes()))
+        if sys.byteorder != "little":
+            entries.byteswap()
+        return _header_define(path, b"TILE_MAP_WIDTH"), entries
+    width = tile_map.dims[0] if tile_map.dims else len(tile_map)
+    return width, tile_map.values
+
+
+def _header_define(path, macro):
+    """Integer value of a #define in the .h file next to a .c file"""
+    header_path = os.path.splitext(path)[0] + ".h"
+    try:
+        with open(header_path, "rb") as f:
+            match = re.search(rb"#define\s+" + macro + rb"\s+(\d+)", f.read())
+    except OSError:
+        match = None
+    if match is None:
+        raise ValueError("no %s in %s" % (macro.decode("ascii"), header_path))
+    return int(match.group(1))
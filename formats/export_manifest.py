@@ -0,0 +1,134 @@
+"""Skip rewriting exported files whose content has not changed, so builds only redo what changed
+
+A manifest next to the outputs records each file's hash and the hash of
+the project data and options it was generated from. If those still
+match and the file is untouched on disk, the export is skipped; otherwise
+it is generated and only files whose content differs are written, which
+keeps their timestamps for make.
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = ".gtexport.json"
+
+# Bump when an exporter's output changes for the same project, so older manifests do not skip it
+EXPORT_VERSION = 1
+
+
+def project_hash(project, *options):
+    """Hash of the project data and export options that outputs are generated from"""
+    tileset = project.tileset
+    tilemap = project.tilemap
+    digest = hashlib.sha1(repr((EXPORT_VERSION, tileset.bpp, tilemap.width, tilemap.height, options)).encode())
+    digest.update(project.palette.colors.tobytes())
+    digest.update(tileset.data)
+    # Stored chunks rather than a dense copy; an all-zero chunk present or not only costs a regeneration
+    for key in sorted(tilemap.chunks):
+        digest.update(repr(key).encode())
+        digest.update(tilemap.chunks[key].tobytes())
+    return digest.hexdigest()
+
+
+class ExportManifest:
+    """Hashes of the files exported into one directory, loaded from and saved to its manifest file
+
+    force rewrites every file regardless of the recorded hashes.
+    """
+
+    def __init__(self, output_dir, force=False):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.force = force
+        self.files = {}  # Path relative to output_dir -> {"sha1", "size", "mtime_ns", "source"}
+        self.written = []
+        self.unchanged = []
+        self._changed = False
+        try:
+            with open(self.path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == EXPORT_VERSION:
+                self.files = manifest["files"]
+        except (OSError, ValueError, KeyError):
+            pass  # Missing or unreadable: existing files are compared by content instead
+
+    def _name(self, path):
+        return os.path.relpath(path, self.output_dir).replace(os.sep, "/")
+
+    def _untouched(self, path, entry):
+        """Whether path still has the size and modification time recorded for it"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+
+    def _record(self, path, digest, source):
+        stat = os.stat(path)
+        self.files[self._name(path)] = {"sha1": digest, "size": stat.st_size,
+                                        "mtime_ns": stat.st_mtime_ns, "source": source}
+        self._changed = True
+
+    def is_current(self, paths, source):
+        """Whether all paths were generated from source and are untouched since"""
+        if self.force:
+            return False
+        for path in paths:
+            entry = self.files.get(self._name(path))
+            if entry is None or entry["source"] != source or not self._untouched(path, entry):
+                return False
+        self.unchanged += paths
+        return True
+
+    def write(self, path, data, source=None):
+        """Write data (str as text, or bytes) to path unless it already holds it; returns whether it wrote"""
+        if isinstance(data, str):
+            data = data.replace("\n", os.linesep).encode("utf-8")  # As a text mode write would
+        digest = hashlib.sha1(data).hexdigest()
+        entry = self.files.get(self._name(path))
+        if not self.force:
+            if entry is not None and entry["sha1"] == digest and self._untouched(path, entry):
+                same = True
+            else:
+                # No record, or touched since: compare with what is there
+                try:
+                    with open(path, "rb") as f:
+                        same = hashlib.sha1(f.read()).hexdigest() == digest
+                except OSError:
+                    same = False
+            if same:
+                if entry is None or entry["source"] != source or not self._untouched(path, entry):
+                    self._record(path, digest, source)
+                self.unchanged.append(path)
+                return False
+
+        with open(path, "wb") as f:
+            f.write(data)
+        self._record(path, digest, source)
+        self.written.append(path)
+        return True
+
+    def save(self):
+        """Write the manifest file if anything was recorded since loading"""
+        if not self._changed:
+            return
+        with open(self.path, "w") as f:
+            json.dump({"version": EXPORT_VERSION, "files": self.files}, f, indent=1, sort_keys=True)
+        self._changed = False
+
+
+def export(manifest, output_dir, paths, source, generate):
+    """Write the data generate() returns for each path, unless the outputs are current for source
+
+    manifest may be None to use output_dir's manifest and save it
+    afterwards. Returns paths.
+    """
+    own_manifest = manifest is None
+    if own_manifest:
+        manifest = ExportManifest(output_dir)
+    if not manifest.is_current(paths, source):
+        for path, data in zip(paths, generate()):
+            manifest.write(path, data, source)
+    if own_manifest:
+        manifest.save()
+    return paths
@@ -0,0 +1,397 @@
+"""GBA BIOS compression formats: LZ77, run-length and Huffman streams with their decoders
+
+Streams start with the BIOS data header (type in the high nibble of the
+first byte, 24-bit unpacked size after it) and are padded to a multiple of
+4 bytes, so they can be passed straight to LZ77UnCompVram, RLUnCompVram and
+HuffUnComp from 4-byte aligned ROM arrays.
+"""
+import heapq
+import re
+from collections import Counter
+
+TYPE_LZ77 = 0x10
+TYPE_HUFFMAN = 0x20
+TYPE_RLE = 0x30
+
+CODECS = ("lz77", "rle", "huff4", "huff8")
+
+LZ_MIN_MATCH = 3
+LZ_MAX_MATCH = 18
+LZ_WINDOW = 4096
+LZ_MAX_CHAIN = 64  # Candidates tried per position before settling for the best so far
+
+RLE_MIN_RUN = 3
+RLE_MAX_RUN = 130
+RLE_MAX_LITERALS = 128
+_RUNS = re.compile(rb"(.)\1{%d,}" % (RLE_MIN_RUN - 1), re.DOTALL)  # Runs worth encoding
+
+HUFF_MAX_OFFSET = 63  # 6-bit child offset in tree nodes
+
+# Byte lookup tables for splitting bytes into nibbles
+_LOW_NIBBLE = bytes(i & 0x0F for i in range(256))
+_HIGH_NIBBLE = bytes(i >> 4 for i in range(256))
+
+
+def _header(kind, size):
+    if size >= 1 << 24:
+        raise ValueError("GBA compressed data is limited to 16 MB, got %d bytes" % size)
+    return bytes((kind, size & 0xFF, (size >> 8) & 0xFF, size >> 16))
+
+
+def _read_header(data, kind):
+    """Return the unpacked size of a stream, checking its type"""
+    if len(data) < 4 or data[0] & 0xF0 != kind:
+        raise ValueError("not a type 0x%02X GBA compressed stream" % kind)
+    return data[1] | data[2] << 8 | data[3] << 16
+
+
+def _pad4(out):
+    out += bytes(-len(out) % 4)
+    return bytes(out)
+
+
+def lz77_compress(data, vram=True, max_chain=LZ_MAX_CHAIN):
+    """Compress to a BIOS LZ77 stream, finding matches through hash chains of 3-byte prefixes
+
+    With vram set, matches never copy from the previous byte, which
+    LZ77UnCompVram cannot do as it writes 16 bits at a time.
+    """
+    data = bytes(data)
+    n = len(data)
+    min_disp = 2 if vram else 1
+    out = bytearray(_header(TYPE_LZ77, n))
+    head = {}  # 3-byte prefix -> last position starting with it
+    chain = [-1] * n  # Position -> previous position with the same prefix
+    hashed = 0  # Positions below this are in the chains
+
+    flags_at = 0
+    flag_bit = 0
+    pos = 0
+    while pos < n:
+        if not flag_bit:
+            flags_at = len(out)
+            out.append(0)
+            flag_bit = 0x80
+
+        best_len = LZ_MIN_MATCH - 1
+        best_disp = 0
+        max_len = min(LZ_MAX_MATCH, n - pos)
+        if max_len >= LZ_MIN_MATCH:
+            window_start = pos - LZ_WINDOW
+            candidate = head.get(data[pos:pos + LZ_MIN_MATCH], -1)
+            tries = max_chain
+            while candidate >= 0 and candidate >= window_start and tries:
+                tries -= 1
+                # Only a match longer than the best so far is worth extending
+                if pos - candidate >= min_disp and data[candidate + best_len] == data[pos + best_len]:
+                    length = LZ_MIN_MATCH  # The prefix is known to match
+                    while length < max_len and data[candidate + length] == data[pos + length]:
+                        length += 1
+                    if length > best_len:
+                        best_len = length
+                        best_disp = pos - candidate
+                        if length == max_len:
+                            break
+                candidate = chain[candidate]
+
+        if best_disp:
+            out[flags_at] |= flag_bit
+            disp = best_disp - 1
+            out += bytes(((best_len - LZ_MIN_MATCH) << 4 | disp >> 8, disp & 0xFF))
+            advance = best_len
+        else:
+            out.append(data[pos])
+            advance = 1
+        flag_bit >>= 1
+
+        # Chain every position passed over, including those inside the match
+        pos += advance
+        for p in range(hashed, min(pos, n - LZ_MIN_MATCH + 1)):
+            key = data[p:p + LZ_MIN_MATCH]
+            chain[p] = head.get(key, -1)
+            head[key] = p
+        hashed = pos
+    return _pad4(out)
+
+
+def lz77_decompress(data):
+    """Decode a BIOS LZ77 stream"""
+    size = _read_header(data, TYPE_LZ77)
+    out = bytearray()
+    pos = 4
+    try:
+        while len(out) < size:
+            flags = data[pos]
+            pos += 1
+            for bit in (0x80, 0x40, 0x20, 0x10, 0x08, 0x04, 0x02, 0x01):
+                if len(out) >= size:
+                    break
+                if not flags & bit:
+                    out.append(data[pos])
+                    pos += 1
+                    continue
+                length = (data[pos] >> 4) + LZ_MIN_MATCH
+                disp = ((data[pos] & 0x0F) << 8 | data[pos + 1]) + 1
+                pos += 2
+                start = len(out) - disp
+                if start < 0:
+                    raise ValueError("LZ77 match reaches before the start of the data")
+                if disp >= length:
+                    out += out[start:start + length]
+                else:  # Overlapping copy repeats the last disp bytes
+                    for i in range(length):
+                        out.append(out[start + i])
+    except IndexError:
+        raise ValueError("truncated LZ77 stream") from None
+    return bytes(out[:size])
+
+
+def rle_compress(data):
+    """Compress to a BIOS run-length stream"""
+    data = bytes(data)
+    out = bytearray(_header(TYPE_RLE, len(data)))
+
+    def write_literals(literals):
+        for start in range(0, len(literals), RLE_MAX_LITERALS):
+            chunk = literals[start:start + RLE_MAX_LITERALS]
+            out.append(len(chunk) - 1)
+            out.extend(chunk)
+
+    literal_start = 0
+    for run in _RUNS.finditer(data):
+        start, end = run.span()
+        write_literals(data[literal_start:start])
+        for run_start in range(start, end - RLE_MIN_RUN + 1, RLE_MAX_RUN):
+            length = min(RLE_MAX_RUN, end - run_start)
+            out += bytes((0x80 | (length - RLE_MIN_RUN), data[start]))
+        # A tail too short for a run starts the next literals
+        literal_start = end - (end - start) % RLE_MAX_RUN if (end - start) % RLE_MAX_RUN < RLE_MIN_RUN else end
+    write_literals(data[literal_start:])
+    return _pad4(out)
+
+
+def rle_decompress(data):
+    """Decode a BIOS run-length stream"""
+    size = _read_header(data, TYPE_RLE)
+    out = bytearray()
+    pos = 4
+    try:
+        while len(out) < size:
+            flag = data[pos]
+            if flag & 0x80:
+                out += bytes((data[pos + 1],)) * ((flag & 0x7F) + RLE_MIN_RUN)
+                pos += 2
+            else:
+                count = (flag & 0x7F) + 1
+                if pos + 1 + count > len(data):
+                    raise IndexError
+                out += data[pos + 1:pos + 1 + count]
+                pos += 1 + count
+    except IndexError:
+        raise ValueError("truncated run-length stream") from None
+    return bytes(out[:size])
+
+
+def _huffman_symbols(data, bits):
+    """Data as a list of symbols: bytes, or nibbles with the low one first"""
+    if bits == 8:
+        return data
+    symbols = bytearray(len(data) * 2)
+    symbols[0::2] = data.translate(_LOW_NIBBLE)
+    symbols[1::2] = data.translate(_HIGH_NIBBLE)
+    return symbols
+
+
+def _huffman_tree(counts):
+    """Build a tree of (node0, node1) tuples with symbols as leaves; the root is always a tuple"""
+    heap = [(count, symbol, symbol) for symbol, count in counts.items()]
+    if len(heap) < 2:
+        symbol = heap[0][2] if heap else 0
+        return (symbol, symbol)
+    heapq.heapify(heap)
+    order = 256  # Tie-breaker past every symbol value, so nodes are never compared
+    while len(heap) > 1:
+        count0, _, node0 = heapq.heappop(heap)
+        count1, _, node1 = heapq.heappop(heap)
+        heapq.heappush(heap, (count0 + count1, order, (node0, node1)))
+        order += 1
+    return heap[0][2]
+
+
+def _subtree_sizes(node, sizes):
+    """Fill sizes with id(node) -> number of tuple nodes in its subtree, returning the root's"""
+    if not isinstance(node, tuple):
+        return 0
+    sizes[id(node)] = size = 1 + _subtree_sizes(node[0], sizes) + _subtree_sizes(node[1], sizes)
+    return size
+
+
+def _deadlines_met(pending, pair):
+    """Whether pending nodes placed from pair on, earliest deadline first, all make their deadline"""
+    deadlines = sorted(parent + HUFF_MAX_OFFSET + 1 for parent, _, _ in pending)
+    return all(deadline >= pair + k for k, deadline in enumerate(deadlines))
+
+
+def _huffman_table(root):
+    """Lay out a tree as the BIOS node table, returned with the tree size byte first
+
+    The children of a node must sit within 64 pairs after the node's own
+    pair. Each pair goes to the pending node with the smallest subtree
+    whose choice still lets every other pending node meet its deadline,
+    which keeps wide trees of 256 symbols within reach where a plain
+    breadth-first layout runs out of offset bits.
+    """
+    sizes = {}
+    _subtree_sizes(root, sizes)
+    table = [0, 0]  # Tree size byte, root node
+    pending = [(0, 1, root)]  # (pair, address, node) of placed nodes whose children are not placed yet
+
+    while pending:
+        pair = len(table) // 2  # Pair that receives the chosen node's children
+        earliest = min(pending, key=lambda p: p[0])
+        for item in sorted(pending, key=lambda p: (sizes[id(p[2])], p[0])):
+            if item is earliest or _deadlines_met([p for p in pending if p is not item], pair + 1):
+                break
+        pending.remove(item)
+        parent_pair, address, node = item
+        if pair > parent_pair + HUFF_MAX_OFFSET + 1:
+            raise ValueError("Huffman tree does not fit the GBA node table")
+
+        flags = 0
+        for i, child in enumerate(node):
+            if isinstance(child, tuple):
+                table.append(0)
+                pending.append((pair, len(table) - 1, child))
+            else:
+                table.append(child)
+                flags |= 0x80 >> i
+        table[address] = flags | (pair - parent_pair - 1)
+
+    table += [0] * (-len(table) % 4)  # The bitstream starts 4-byte aligned
+    table[0] = len(table) // 2 - 1
+    return bytes(table)
+
+
+def _huffman_codes(node, prefix="", codes=None):
+    """Symbol -> code as a string of "0"/"1" characters"""
+    if codes is None:
+        codes = {}
+    if isinstance(node, tuple):
+        _huffman_codes(node[0], prefix + "0", codes)
+        _huffman_codes(node[1], prefix + "1", codes)
+    else:
+        codes.setdefault(node, prefix)
+    return codes
+
+
+def huffman_compress(data, bits=8):
+    """Compress to a BIOS Huffman stream of 4 or 8-bit symbols
+
+    Raises ValueError in the rare case the tree cannot be laid out within
+    the node table's 6-bit child offsets.
+    """
+    if bits not in (4, 8):
+        raise ValueError("Huffman symbols are 4 or 8 bits, not %r" % (bits,))
+    data = bytes(data)
+    symbols = _huffman_symbols(data, bits)
+    root = _huffman_tree(Counter(symbols))
+    codes = _huffman_codes(root)
+
+    # Codes are joined as text and converted once; bit 31 of each word is its first bit
+    stream = "".join(map(codes.__getitem__, symbols))
+    stream += "0" * (-len(stream) % 32)
+    big_endian = int(stream, 2).to_bytes(len(stream) // 8, "big") if stream else b""
+    words = bytearray(len(big_endian))
+    for i in range(4):
+        words[i::4] = big_endian[3 - i::4]
+    return _header(TYPE_HUFFMAN | bits, len(data)) + _huffman_table(root) + bytes(words)
+
+
+def huffman_decompress(data):
+    """Decode a BIOS Huffman stream"""
+    size = _read_header(data, TYPE_HUFFMAN)
+    bits = data[0] & 0x0F
+    if bits not in (4, 8):
+        raise ValueError("unsupported Huffman symbol size %d" % bits)
+    tree = data[4:4 + (data[4] + 1) * 2]
+    stream = data[4 + len(tree):]
+    count = size * 8 // bits
+
+    symbols = bytearray()
+    address = 1
+    try:
+        for pos in range(0, len(stream) - 3, 4):
+            word = int.from_bytes(stream[pos:pos + 4], "little")
+            for shift in range(31, -1, -1):
+                bit = (word >> shift) & 1
+                node = tree[address]
+                child = (address & ~1) + (node & 0x3F) * 2 + 2 + bit
+                if node & (0x40 if bit else 0x80):
+                    symbols.append(tree[child])
+                    if len(symbols) == count:
+                        break
+                    address = 1
+                else:
+                    address = child
+            if len(symbols) == count:
+                break
+    except IndexError:
+        raise ValueError("corrupt Huffman tree") from None
+    if len(symbols) < count:
+        raise ValueError("truncated Huffman stream")
+
+    if bits == 8:
+        return bytes(symbols)
+    return bytes(low | high << 4 for low, high in zip(symbols[0::2], symbols[1::2]))
+
+
+def compress(data, codec):
+    """Compress with one of CODECS"""
+    if codec == "lz77":
+        return lz77_compress(data)
+    if codec == "rle":
+        return rle_compress(data)
+    if codec == "huff4":
+        return huffman_compress(data, 4)
+    if codec == "huff8":
+        return huffman_compress(data, 8)
+    raise ValueError("unknown codec %r, expected one of %s" % (codec, ", ".join(CODECS)))
+
+
+def compress_smallest(data, codecs=CODECS):
+    """Return (codec, stream) for whichever codec compresses data best"""
+    best = None
+    for codec in codecs:
+        try:
+            stream = compress(data, codec)
+        except ValueError:
+            continue  # Huffman tree that does not fit its table
+        if best is None or len(stream) < len(best[1]):
+            best = (codec, stream)
+    if best is None:
+        raise ValueError("no codec could compress the data")
+    return best
+
+
+def stream_codec(data):
+    """Name in CODECS of the codec that produced a stream"""
+    kind = data[0] if data else None
+    if kind == TYPE_LZ77:
+        return "lz77"
+    if kind == TYPE_RLE:
+        return "rle"
+    if kind in (TYPE_HUFFMAN | 4, TYPE_HUFFMAN | 8):
+        return "huff%d" % (kind & 0x0F)
+    raise ValueError("unknown GBA compression header")
+
+
+def decompress(data):
+    """Decode any stream produced by this module, going by its header"""
+    kind = data[0] & 0xF0 if data else None
+    if kind == TYPE_LZ77:
+        return lz77_decompress(data)
+    if kind == TYPE_RLE:
+        return rle_decompress(data)
+    if kind == TYPE_HUFFMAN:
+        return huffman_decompress(data)
+    raise ValueError("unknown GBA compression header")
@@ -0,0 +1,181 @@
+"""Project files: versioned binary container, with JSON still readable"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from formats.tile_codec import pack_4bpp, unpack_4bpp
+from model.project import Project
+from model.tilemap import CHUNK_CELLS
+
+MAGIC = b"GTPJ"
+VERSION = 3
+
+# magic, version, section count, map width, map height
+HEADER = struct.Struct("<4sHHHH")
+# tag, offset from start of file, size in bytes
+SECTION = struct.Struct("<4sII")
+
+SECTION_PALETTE = b"PAL "  # u16 15-bit colors
+SECTION_TILES_4BPP = b"TIL4"  # packed 4bpp tiles, 32 bytes each
+SECTION_TILES_8BPP = b"TIL8"  # 8bpp tiles, one byte per pixel (version 3)
+SECTION_MAP = b"MAP "  # u16 screen entries, row-major (version 1)
+SECTION_MAP_CHUNKS = b"MAPC"  # u32 chunk count, then per chunk u16 x, u16 y and 32x32 u16 entries
+
+CHUNK_COUNT = struct.Struct("<I")
+CHUNK_POS = struct.Struct("<HH")
+
+
+def _u16_bytes(values):
+    values = array("H", values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _u16_array(buffer):
+    values = array("H")
+    values.frombytes(buffer)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _encode_chunks(tilemap):
+    """Only allocated chunks are stored, so empty areas of huge maps cost nothing"""
+    parts = [CHUNK_COUNT.pack(len(tilemap.chunks))]
+    for (chunk_x, chunk_y), chunk in sorted(tilemap.chunks.items()):
+        parts.append(CHUNK_POS.pack(chunk_x, chunk_y))
+        parts.append(_u16_bytes(chunk))
+    return b"".join(parts)
+
+
+def _decode_chunks(buffer):
+    if len(buffer) < CHUNK_COUNT.size:
+        raise ValueError("truncated .gtproj map chunks")
+    (count,) = CHUNK_COUNT.unpack_from(buffer, 0)
+    chunk_bytes = CHUNK_CELLS * 2
+    pos = CHUNK_COUNT.size
+    if pos + count * (CHUNK_POS.size + chunk_bytes) > len(buffer):
+        raise ValueError("truncated .gtproj map chunks: %d chunks do not fit in %d bytes" % (count, len(buffer)))
+    for _ in range(count):
+        chunk_x, chunk_y = CHUNK_POS.unpack_from(buffer, pos)
+        pos += CHUNK_POS.size
+        yield chunk_x, chunk_y, _u16_array(buffer[pos:pos + chunk_bytes])
+        pos += chunk_bytes
+
+
+def encode_project(project):
+    """Return the binary .gtproj bytes for a project"""
+    tileset = project.tileset
+    if tileset.bpp == 8:
+        tiles = (SECTION_TILES_8BPP, bytes(tileset.data))  # Already the stored layout
+    else:
+        tiles = (SECTION_TILES_4BPP, pack_4bpp(tileset.data))
+    sections = [
+        (SECTION_PALETTE, _u16_bytes(project.palette.colors)),
+        tiles,
+        (SECTION_MAP_CHUNKS, _encode_chunks(project.tilemap)),
+    ]
+
+    header = HEADER.pack(MAGIC, VERSION, len(sections), project.tilemap.width, project.tilemap.height)
+    offset = HEADER.size + SECTION.size * len(sections)
+    table = []
+    for tag, payload in sections:
+        table.append(SECTION.pack(tag, offset, len(payload)))
+        offset += len(payload)
+    return b"".join([header] + table + [payload for _, payload in sections])
+
+
+def read_sections(buffer):
+    """Return ((map width, map height), {tag: memoryview}) for a binary .gtproj buffer
+
+    Raises ValueError if the header, section table or a section runs past
+    the end of the buffer. The caller must release_sections() the views
+    before closing an mmap buffer.
+    """
+    view = memoryview(buffer)
+    sections = {}
+    try:
+        if len(view) < HEADER.size:
+            raise ValueError("truncated .gtproj header")
+        magic, version, section_count, width, height = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError("not a binary .gtproj file")
+        if version > VERSION:
+            raise ValueError("unsupported .gtproj version %d" % version)
+        if HEADER.size + section_count * SECTION.size > len(view):
+            raise ValueError("truncated .gtproj section table")
+
+        for i in range(section_count):
+            tag, offset, size = SECTION.unpack_from(view, HEADER.size + i * SECTION.size)
+            if offset + size > len(view):
+                raise ValueError("truncated .gtproj: section %r ends at byte %d of %d"
+                                 % (tag.decode("latin-1"), offset + size, len(view)))
+            sections[tag] = view[offset:offset + size]
+    except Exception:
+        release_sections(sections)
+        raise
+    finally:
+        view.release()  # The section slices stay valid on their own
+    return (width, height), sections
+
+
+def release_sections(sections):
+    """Release the views read_sections() returned, so an mmap they point into can close"""
+    for section in sections.values():
+        section.release()
+
+
+def decode_project(buffer, project=None):
+    """Load binary .gtproj bytes (or an mmap) into project (or a new Project)"""
+    if project is None:
+        project = Project()
+    (width, height), sections = read_sections(buffer)
+    try:
+        _load_sections(project, width, height, sections)
+    finally:
+        release_sections(sections)
+    return project
+
+
+def _load_sections(project, width, height, sections):
+    if SECTION_PALETTE in sections:
+        project.palette.load_gba(_u16_array(sections[SECTION_PALETTE]))
+    if SECTION_TILES_8BPP in sections:
+        project.tileset.load_bytes(sections[SECTION_TILES_8BPP])
+        project.tileset.set_bpp(8)
+    elif SECTION_TILES_4BPP in sections:
+        project.tileset.load_bytes(unpack_4bpp(sections[SECTION_TILES_4BPP]))
+        project.tileset.set_bpp(4)
+    if SECTION_MAP_CHUNKS in sections:
+        project.tilemap.resize(width, height)
+        project.tilemap.load_chunks(_decode_chunks(sections[SECTION_MAP_CHUNKS]))
+        project.tilemap.clamp_tiles(len(project.tileset))
+    elif SECTION_MAP in sections:
+        project.tilemap.resize(width, height)
+        project.tilemap.load_entries(_u16_array(sections[SECTION_MAP]), width)
+        project.tilemap.clamp_tiles(len(project.tileset))
+
+
+def save_project(project, path):
+    """Write a project to a binary .gtproj file"""
+    with open(path, "wb") as f:
+        f.write(encode_project(project))
+
+
+def load_project(path, project=None):
+    """Read a binary or legacy JSON .gtproj file into project (or a new Project) and return it"""
+    if project is None:
+        project = Project()
+
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            f.seek(0)
+            project.load_dict(json.load(f))
+            return project
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            decode_project(mm, project)
+    return project
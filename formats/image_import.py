@@ -0,0 +1,185 @@
+"""Import a PNG background as palette, deduplicated tileset and tilemap"""
+from array import array
+
+from model.optimize import TileIndex, pack_palette_banks
+from model.palette import BANK_COUNT, PALETTE_SIZE, rgb_to_gba
+from model.tilemap import make_entry
+from model.tileset import TILE_PIXELS, TILE_SIZE
+from formats.png import read_png
+from formats.quantize import quantize
+
+
+class ImageImportResult:
+    """Summary of an import_image() run"""
+
+    def __init__(self, width, height, colors, tiles, unique_tiles, banks=1):
+        self.width = width  # Map size in tiles
+        self.height = height
+        self.colors = colors  # Distinct colors kept, including transparent
+        self.tiles = tiles  # Map cells
+        self.unique_tiles = unique_tiles  # Tiles stored, including the empty tile 0
+        self.banks = banks  # Palette banks used
+
+    def __str__(self):
+        return (f"{self.width}x{self.height} map, {self.unique_tiles} unique tiles "
+                f"for {self.tiles} cells, {self.colors} colors in {self.banks} palette banks")
+
+
+def is_gba_palette_image(image, transparent=None, count=PALETTE_SIZE):
+    """Whether an indexed image can keep its own palette as count colors, index 0 transparent"""
+    # tRNS may only make index 0 transparent
+    return (image.mode == "P" and len(image.palette) <= count and transparent is None
+            and all(alpha >= 128 for alpha in image.alpha[1:]))
+
+
+def image_to_indices(image, transparent=None, dither=0, count=PALETTE_SIZE):
+    """Map an image to one palette index per pixel, index 0 being transparent
+
+    Colors are compared in GBA 15-bit space and numbered from 1 in order of
+    first appearance. Pixels with alpha below 128 and pixels of the
+    transparent (r, g, b) color, if given, become index 0. Images with more
+    than count - 1 colors are quantized, with ordered dithering of the given
+    strength. Returns (15-bit palette, index bytes).
+    """
+    if is_gba_palette_image(image, transparent, count):
+        # Already a GBA palette, keep the artist's order
+        return [rgb_to_gba(*rgb) for rgb in image.palette], bytes(image.pixels)
+
+    pixel_keys, transparent = image_colors(image, transparent)
+    palette = [transparent or 0]  # Index 0 doubles as the backdrop color
+    index_of = {None: 0}
+    for key in dict.fromkeys(pixel_keys):  # Distinct colors in order of appearance
+        if key not in index_of:
+            index_of[key] = len(palette)
+            palette.append(key)
+    if len(palette) > count:
+        colors, indices = quantize(pixel_keys, image.width, count - 1, dither)
+        return [transparent or 0] + colors, indices
+    return palette, bytes(map(index_of.__getitem__, pixel_keys))
+
+
+def image_colors(image, transparent=None):
+    """Return (15-bit color per pixel, transparent color as 15-bit or None)
+
+    Pixels with alpha below 128 or of the transparent (r, g, b) color are None.
+    """
+    if image.mode == "P":
+        colors = [rgb_to_gba(*rgb) for rgb in image.palette]
+        keys = [None if alpha < 128 else color for color, alpha in zip(colors, image.alpha)]
+        pixel_keys = list(map(keys.__getitem__, image.pixels))
+    else:
+        pixels = image.pixels
+        channels = len(image.mode)
+        rgb = zip(pixels[0::channels], pixels[1::channels], pixels[2::channels])
+        if channels == 4:
+            pixel_keys = [None if a < 128 else c for c, a in zip(rgb, pixels[3::channels])]
+        else:
+            pixel_keys = list(rgb)
+        # Convert each distinct color once rather than every pixel
+        unique = {key: rgb_to_gba(*key) for key in set(pixel_keys) if key is not None}
+        pixel_keys = list(map(unique.get, pixel_keys))
+    if transparent is not None:
+        transparent = rgb_to_gba(*transparent)
+        pixel_keys = [None if key == transparent else key for key in pixel_keys]
+    return pixel_keys, transparent
+
+
+def banked_tiles(colors, width, height, transparent=None):
+    """Slice per-pixel 15-bit colors into tiles that each use one palette bank
+
+    The colors of every tile are packed into the fewest banks of 15 colors
+    plus transparency. Returns (palette of BANK_COUNT banks, tiles
+    across, tiles down, 64-byte tiles, bank per tile), or None if a tile has
+    more than 15 colors or the tiles need more than BANK_COUNT banks.
+    """
+    # Number the colors so tiles can be sliced as 16-bit pixels
+    ids = {None: 0}
+    for color in dict.fromkeys(colors):
+        if color not in ids:
+            ids[color] = len(ids)
+    data = array('H', map(ids.__getitem__, colors)).tobytes()
+    across, down, id_tiles = slice_tiles(data, width, height, itemsize=2)
+    id_tiles = [array('H', tile) for tile in id_tiles]
+
+    packed = pack_palette_banks([set(tile) - {0} for tile in id_tiles])
+    if packed is None:
+        return None
+    banks, tile_banks = packed
+
+    color_of = {i: color for color, i in ids.items()}
+    palette = [transparent or 0] + [0] * (BANK_COUNT * PALETTE_SIZE - 1)
+    lookups = []
+    for bank, bank_ids in enumerate(banks):
+        palette[bank * PALETTE_SIZE + 1:bank * PALETTE_SIZE + 1 + len(bank_ids)] = map(color_of.get, bank_ids)
+        lookup = {0: 0}
+        lookup.update((i, n + 1) for n, i in enumerate(bank_ids))
+        lookups.append(lookup)
+    tiles = [bytes(map(lookups[bank].get, tile)) for tile, bank in zip(id_tiles, tile_banks)]
+    return palette, across, down, tiles, tile_banks
+
+
+def slice_tiles(indices, width, height, itemsize=1):
+    """Cut row-major pixel indices into 8x8 tiles, padding partial tiles with index 0
+
+    indices holds itemsize bytes per pixel. Returns (tiles across, tiles
+    down, list of tiles in row-major order).
+    """
+    across = (width + TILE_SIZE - 1) // TILE_SIZE
+    down = (height + TILE_SIZE - 1) // TILE_SIZE
+    row_bytes = width * itemsize
+    strip = TILE_SIZE * itemsize
+    padded = across * strip
+    rows = [indices[y * row_bytes:(y + 1) * row_bytes].ljust(padded, b"\0") for y in range(height)]
+    rows += [bytes(padded)] * (down * TILE_SIZE - height)
+
+    tiles = []
+    for ty in range(down):
+        # Split each pixel row of this tile row into 8-pixel strips, then join the strips column-wise
+        strips = [[row[x:x + strip] for x in range(0, padded, strip)]
+                  for row in rows[ty * TILE_SIZE:(ty + 1) * TILE_SIZE]]
+        tiles.extend(map(b"".join, zip(*strips)))
+    return across, down, tiles
+
+
+def import_image(project, path, transparent=None, dither=0, banks=True):
+    """Replace the project's palette, tileset and tilemap with a PNG image
+
+    For 4bpp projects, images with more than 15 colors are split over
+    palette banks when each tile has at most 15 (and banks is set), and
+    quantized to one bank otherwise. 8bpp projects take up to 255 colors
+    before quantizing. Duplicate tiles, including mirrored ones, are stored once
+    and placed with flip bits. Empty tiles map to tile 0. Raises ValueError
+    if the image has too many unique tiles.
+    """
+    image = read_png(path)
+    banked = None
+    eight_bpp = project.tileset.bpp == 8
+    # An indexed image that already fits one bank keeps its palette, even if index 0 is opaque
+    if banks and not eight_bpp and not is_gba_palette_image(image, transparent):
+        colors, transparent_color = image_colors(image, transparent)
+        color_count = len(set(colors) | {None})
+        if color_count > PALETTE_SIZE:
+            banked = banked_tiles(colors, image.width, image.height, transparent_color)
+    if banked is not None:
+        palette, across, down, tiles, tile_banks = banked
+    else:
+        count = len(project.palette) if eight_bpp else PALETTE_SIZE
+        palette, indices = image_to_indices(image, transparent, dither, count)
+        across, down, tiles = slice_tiles(indices, image.width, image.height)
+        tile_banks = [0] * len(tiles)
+        color_count = len(palette)
+
+    index = TileIndex()
+    index.add(bytes(TILE_PIXELS))  # Transparent cells use tile 0
+    entries = []
+    for tile, bank in zip(tiles, tile_banks):
+        position, flip_h, flip_v = index.add(tile)
+        entries.append(make_entry(position, flip_h, flip_v, bank if position else 0))
+    if len(index) > len(project.tileset):
+        raise ValueError(f"Image needs {len(index)} unique tiles, the tileset holds {len(project.tileset)}")
+
+    project.palette.load_gba(palette)
+    project.tileset.load_bytes(b"".join(index.tiles))
+    project.tilemap.resize(across, down)
+    project.tilemap.load_entries(entries, across)
+    return ImageImportResult(across, down, color_count, len(tiles), len(index), max(tile_banks, default=0) + 1)
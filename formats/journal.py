@@ -0,0 +1,208 @@
+"""Incremental autosave: a binary .gtproj snapshot plus an append-only journal of deltas"""
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from formats import gtproj
+from model.tilemap import ALL_CELLS
+from model.tileset import TILE_PIXELS
+
+JOURNAL_SUFFIX = ".journal"
+
+# magic, crc32 and size of the snapshot the journal's records apply to
+JOURNAL_HEADER = struct.Struct("<4sII")
+JOURNAL_MAGIC = b"GTJ1"
+
+# payload size, crc32 of payload
+RECORD = struct.Struct("<II")
+# tag, entry count
+CHUNK = struct.Struct("<4sI")
+
+CHUNK_PALETTE = b"PAL "  # count u16 indices, count u16 colors
+CHUNK_TILES = b"TILE"  # count u16 indices, count * 64 pixel bytes
+CHUNK_BPP = b"BPP "  # no payload, the count field holds the tile mode (4 or 8)
+CHUNK_MAP = b"MAP "  # u16 map width, u16 map height, count u32 offsets, count u16 entries
+MAP_SIZE = struct.Struct("<HH")
+
+
+def _le_bytes(typecode, values):
+    values = array(typecode, values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _le_array(typecode, buffer):
+    values = array(typecode)
+    values.frombytes(buffer)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def write_atomic(path, data):
+    """Write data to a temporary file and rename it over path"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def encode_delta(project, palette_indices, tile_indices, map_offsets):
+    """Return one journal record holding the current values of the given entries"""
+    chunks = []
+    if palette_indices:
+        indices = sorted(palette_indices)
+        colors = [project.palette.colors[i] for i in indices]
+        chunks += [CHUNK.pack(CHUNK_PALETTE, len(indices)),
+                   _le_bytes("H", indices), _le_bytes("H", colors)]
+    if tile_indices:
+        indices = sorted(tile_indices)
+        chunks += [CHUNK.pack(CHUNK_TILES, len(indices)), _le_bytes("H", indices)]
+        chunks += [project.tileset.get_tile(i) for i in indices]
+        # After the pixels, so switching back to 4bpp sees the reduced values
+        chunks.append(CHUNK.pack(CHUNK_BPP, project.tileset.bpp))
+    if map_offsets:
+        tilemap = project.tilemap
+        width = tilemap.width
+        offsets = sorted(map_offsets)
+        entries = [tilemap.get_entry(o % width, o // width) for o in offsets]
+        chunks += [CHUNK.pack(CHUNK_MAP, len(offsets)), MAP_SIZE.pack(tilemap.width, tilemap.height),
+                   _le_bytes("I", offsets), _le_bytes("H", entries)]
+
+    payload = b"".join(chunks)
+    return RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def apply_delta(project, payload):
+    """Apply one journal record payload to the project"""
+    view = memoryview(payload)
+    pos = 0
+    while pos < len(view):
+        tag, count = CHUNK.unpack_from(view, pos)
+        pos += CHUNK.size
+        if tag == CHUNK_PALETTE:
+            indices = _le_array("H", view[pos:pos + 2 * count])
+            colors = _le_array("H", view[pos + 2 * count:pos + 4 * count])
+            project.palette.update(indices, colors)
+            pos += 4 * count
+        elif tag == CHUNK_TILES:
+            indices = _le_array("H", view[pos:pos + 2 * count])
+            pos += 2 * count
+            project.tileset.update(indices, view[pos:pos + TILE_PIXELS * count])
+            pos += TILE_PIXELS * count
+        elif tag == CHUNK_BPP:
+            project.tileset.set_bpp(count)
+        elif tag == CHUNK_MAP:
+            width, height = MAP_SIZE.unpack_from(view, pos)
+            pos += MAP_SIZE.size
+            if (width, height) != (project.tilemap.width, project.tilemap.height):
+                project.tilemap.resize(width, height)
+            offsets = _le_array("I", view[pos:pos + 4 * count])
+            entries = _le_array("H", view[pos + 4 * count:pos + 6 * count])
+            project.tilemap.update(offsets, entries)
+            pos += 6 * count
+        else:
+            raise ValueError("unknown journal chunk %r" % tag)
+
+
+class AutosaveJournal:
+    """Keeps snapshot_path up to date by appending only what changed since the last save"""
+
+    def __init__(self, snapshot_path, compact_ratio=0.5):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + JOURNAL_SUFFIX
+        # Compact once the journal grows past this fraction of the snapshot size
+        self.compact_ratio = compact_ratio
+        self._snapshot_stamp = None  # (crc32, size) of the snapshot on disk, once known
+
+    def journal_size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except OSError:
+            return 0
+
+    def save(self, project, dirty=None):
+        """Persist pending changes, returning "snapshot", "journal" or None if nothing changed
+
+        dirty defaults to project.take_dirty(); pass it explicitly when saving a copy().
+        """
+        if dirty is None:
+            dirty = project.take_dirty()
+        palette_indices, tile_indices, map_offsets = dirty
+        if not (palette_indices or tile_indices or map_offsets):
+            return None
+
+        if not os.path.exists(self.snapshot_path) or map_offsets is ALL_CELLS:
+            self.compact(project)
+            return "snapshot"
+
+        record = encode_delta(project, palette_indices, tile_indices, map_offsets)
+        snapshot_size = os.path.getsize(self.snapshot_path)
+        if self.journal_size() + len(record) > snapshot_size * self.compact_ratio:
+            self.compact(project)
+            return "snapshot"
+
+        # A new journal starts by naming the snapshot its records apply to
+        header = b"" if self.journal_size() else JOURNAL_HEADER.pack(JOURNAL_MAGIC, *self.snapshot_stamp())
+        with open(self.journal_path, "ab") as f:
+            f.write(header + record)
+        return "journal"
+
+    def snapshot_stamp(self):
+        """(crc32, size) of the snapshot file, which a journal must carry to be replayed over it"""
+        if self._snapshot_stamp is None:
+            with open(self.snapshot_path, "rb") as f:
+                data = f.read()
+            self._snapshot_stamp = (zlib.crc32(data), len(data))
+        return self._snapshot_stamp
+
+    def compact(self, project):
+        """Write a fresh snapshot and drop the journal it supersedes
+
+        If the process dies between the two, the old journal's header names
+        the previous snapshot, so recover() ignores it.
+        """
+        data = gtproj.encode_project(project)
+        write_atomic(self.snapshot_path, data)
+        self._snapshot_stamp = (zlib.crc32(data), len(data))
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def recover(self, project):
+        """Load the snapshot and replay the journal, returning the number of records applied"""
+        gtproj.load_project(self.snapshot_path, project)
+        self._snapshot_stamp = None
+
+        applied = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                journal = f.read()
+            if (len(journal) < JOURNAL_HEADER.size
+                    or JOURNAL_HEADER.unpack_from(journal) != (JOURNAL_MAGIC,) + self.snapshot_stamp()):
+                # Written for an older snapshot, left behind by a crash during compact()
+                os.remove(self.journal_path)
+                project.take_dirty()
+                return 0
+            pos = JOURNAL_HEADER.size
+            while pos + RECORD.size <= len(journal):
+                size, crc = RECORD.unpack_from(journal, pos)
+                payload = journal[pos + RECORD.size:pos + RECORD.size + size]
+                if len(payload) < size or zlib.crc32(payload) != crc:
+                    break  # Torn write at the end of the journal
+                apply_delta(project, payload)
+                applied += 1
+                pos += RECORD.size + size
+
+            if pos < len(journal):
+                # Cut the torn tail so later appends stay readable
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(pos)
+
+        # What is on disk now matches the model
+        project.take_dirty()
+        return applied
@@ -0,0 +1,171 @@
+"""Minimal PNG reader using only zlib: grayscale, RGB, indexed, with or without alpha"""
+import struct
+import zlib
+from itertools import accumulate
+
+SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Color type -> samples per pixel
+_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+class PngImage:
+    """Decoded image, always 8 bits per sample
+
+    mode is "P" (one palette index per pixel, with palette and alpha lists),
+    "RGB" or "RGBA". Grayscale images are expanded to RGB/RGBA.
+    """
+
+    def __init__(self, width, height, mode, pixels, palette=None, alpha=None):
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.pixels = pixels  # Row-major bytes
+        self.palette = palette  # [(r, g, b), ...] for mode "P"
+        self.alpha = alpha  # Per palette entry alpha for mode "P", from tRNS
+
+
+_MASKS = {}  # Row length -> (0x7f7f..., 0x8080...) masks for _add_bytes
+
+
+def _add_bytes(a, b):
+    """Bytewise (a + b) % 256 of two equal-length byte strings, with big-int arithmetic"""
+    n = len(a)
+    if n not in _MASKS:
+        _MASKS[n] = (int.from_bytes(b"\x7f" * n, "little"), int.from_bytes(b"\x80" * n, "little"))
+    low, high = _MASKS[n]
+    x = int.from_bytes(a, "little")
+    y = int.from_bytes(b, "little")
+    return (((x & low) + (y & low)) ^ ((x ^ y) & high)).to_bytes(n, "little")
+
+
+def _unfilter(data, row_bytes, height, bpp):
+    """Undo the per-row PNG filters of decompressed image data"""
+    out = bytearray(row_bytes * height)
+    prev = bytes(row_bytes)
+    pos = 0
+    for y in range(height):
+        filter_type = data[pos]
+        row = bytearray(data[pos + 1:pos + 1 + row_bytes])
+        pos += 1 + row_bytes
+
+        if filter_type == 1:  # Sub: running sum per channel
+            for c in range(bpp):
+                row[c::bpp] = bytes(map((255).__and__, accumulate(row[c::bpp])))
+        elif filter_type == 2:  # Up
+            row = _add_bytes(row, prev)
+        elif filter_type == 3:  # Average
+            for i in range(row_bytes):
+                left = row[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + ((left + prev[i]) >> 1)) & 255
+        elif filter_type == 4:  # Paeth
+            for i in range(row_bytes):
+                a = row[i - bpp] if i >= bpp else 0
+                b = prev[i]
+                c = prev[i - bpp] if i >= bpp else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                if pa <= pb and pa <= pc:
+                    row[i] = (row[i] + a) & 255
+                elif pb <= pc:
+                    row[i] = (row[i] + b) & 255
+                else:
+                    row[i] = (row[i] + c) & 255
+        elif filter_type != 0:
+            raise ValueError(f"Unknown PNG filter type {filter_type}")
+
+        out[y * row_bytes:(y + 1) * row_bytes] = row
+        prev = row
+    return out
+
+
+def _unpack_bits(data, width, height, depth, row_bytes):
+    """Expand 1, 2 or 4-bit samples to one byte each"""
+    per_byte = 8 // depth
+    mask = (1 << depth) - 1
+    table = [bytes((b >> (8 - depth * (i + 1))) & mask for i in range(per_byte)) for b in range(256)]
+    out = bytearray()
+    for y in range(height):
+        row = data[y * row_bytes:(y + 1) * row_bytes]
+        out += b"".join(map(table.__getitem__, row))[:width]
+    return bytes(out)
+
+
+def decode_png(buffer):
+    """Decode PNG file contents into a PngImage"""
+    if buffer[:8] != SIGNATURE:
+        raise ValueError("Not a PNG file")
+
+    pos = 8
+    header = None
+    palette = None
+    trns = None
+    idat = []
+    while pos < len(buffer):
+        length, tag = struct.unpack_from(">I4s", buffer, pos)
+        body = buffer[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if tag == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif tag == b"PLTE":
+            palette = [tuple(body[i:i + 3]) for i in range(0, len(body), 3)]
+        elif tag == b"tRNS":
+            trns = bytes(body)
+        elif tag == b"IDAT":
+            idat.append(body)
+        elif tag == b"IEND":
+            break
+    if header is None:
+        raise ValueError("PNG file has no IHDR chunk")
+
+    width, height, depth, color_type, _, _, interlace = header
+    if color_type not in _CHANNELS:
+        raise ValueError(f"Unsupported PNG color type {color_type}")
+    if interlace:
+        raise ValueError("Interlaced PNG files are not supported")
+
+    channels = _CHANNELS[color_type]
+    bits = depth * channels
+    row_bytes = (width * bits + 7) // 8
+    try:
+        data = zlib.decompress(b"".join(idat))
+    except zlib.error as e:
+        raise ValueError(f"Corrupt PNG image data ({e})")
+    data = _unfilter(data, row_bytes, height, max(1, bits // 8))
+
+    if depth == 16:
+        data = data[::2]  # Keep the high byte of each sample
+    elif depth < 8:
+        data = _unpack_bits(data, width, height, depth, row_bytes)
+        if color_type == 0:
+            data = bytes(v * 255 // ((1 << depth) - 1) for v in data)
+
+    if color_type == 3:
+        if palette is None:
+            raise ValueError("Indexed PNG file has no PLTE chunk")
+        alpha = list(trns or b"") + [255] * (len(palette) - len(trns or b""))
+        return PngImage(width, height, "P", bytes(data), palette, alpha)
+    if color_type == 0:  # Gray -> RGB, with a tRNS gray level as transparency
+        if trns:
+            key = struct.unpack(">H", trns[:2])[0]
+            key = key >> 8 if depth == 16 else key * 255 // ((1 << depth) - 1)
+            alpha = bytes(map(lambda v: 0 if v == key else 255, data))
+            return PngImage(width, height, "RGBA", _interleave(data, data, data, alpha))
+        return PngImage(width, height, "RGB", _interleave(data, data, data))
+    if color_type == 4:
+        gray, alpha = data[0::2], data[1::2]
+        return PngImage(width, height, "RGBA", _interleave(gray, gray, gray, alpha))
+    return PngImage(width, height, "RGB" if color_type == 2 else "RGBA", bytes(data))
+
+
+def _interleave(*planes):
+    """Interleave equal-length sample planes into one pixel buffer"""
+    out = bytearray(len(planes[0]) * len(planes))
+    for i, plane in enumerate(planes):
+        out[i::len(planes)] = plane
+    return bytes(out)
+
+
+def read_png(path):
+    with open(path, "rb") as f:
+        return decode_png(f.read())
@@ -0,0 +1,117 @@
+"""Reduce true-color art to a small palette of GBA 15-bit colors"""
+from collections import Counter
+
+# 4x4 Bayer matrix for ordered dithering
+BAYER_4X4 = (
+    (0, 8, 2, 10),
+    (12, 4, 14, 6),
+    (3, 11, 1, 9),
+    (15, 7, 13, 5),
+)
+
+
+def _channels(color):
+    return color & 0x1F, (color >> 5) & 0x1F, color >> 10
+
+
+def _widest_channel(box):
+    """Return (range, channel) of the channel with the largest spread in a box of (color, count)"""
+    ranges = []
+    for channel in range(3):
+        values = [_channels(color)[channel] for color, _ in box]
+        ranges.append((max(values) - min(values), channel))
+    return max(ranges)
+
+
+def median_cut(histogram, count):
+    """Split a {15-bit color: pixel count} histogram into at most count weighted-average colors
+
+    The box whose widest channel range times pixel count is largest is
+    split at its weighted median along that channel, until there are count
+    boxes or none can be split.
+    """
+    boxes = [list(histogram.items())]
+    while len(boxes) < count:
+        splittable = [box for box in boxes if len(box) > 1]
+        if not splittable:
+            break
+        box = max(splittable, key=lambda b: _widest_channel(b)[0] * sum(n for _, n in b))
+        boxes.remove(box)
+
+        channel = _widest_channel(box)[1]
+        box.sort(key=lambda item: _channels(item[0])[channel])
+        half = sum(n for _, n in box) / 2
+        seen = 0
+        for split, (_, n) in enumerate(box):
+            seen += n
+            if seen >= half:
+                break
+        split = min(max(split + 1, 1), len(box) - 1)
+        boxes += [box[:split], box[split:]]
+
+    palette = []
+    for box in boxes:
+        total = sum(n for _, n in box)
+        r, g, b = (round(sum(_channels(color)[c] * n for color, n in box) / total) for c in range(3))
+        palette.append((b << 10) | (g << 5) | r)
+    return palette
+
+
+class NearestColor(dict):
+    """15-bit color -> palette index of the closest entry, computed on first lookup
+
+    Being a dict, it can be mapped over whole rows at C speed; only colors
+    not seen before run the distance search.
+    """
+
+    def __init__(self, palette, first_index=0):
+        super().__init__()
+        self.entries = [(first_index + i, _channels(color)) for i, color in enumerate(palette)]
+
+    def __missing__(self, color):
+        r, g, b = _channels(color)
+        # Green weighs most and blue least, roughly following perceived brightness
+        index = min(self.entries, key=lambda e: 2 * (e[1][0] - r) ** 2 + 4 * (e[1][1] - g) ** 2
+                    + 3 * (e[1][2] - b) ** 2)[0]
+        self[color] = index
+        return index
+
+
+def _offset_color(color, offset):
+    r, g, b = (min(31, max(0, v + offset)) for v in _channels(color))
+    return (b << 10) | (g << 5) | r
+
+
+def quantize(colors, width, count=15, dither=0):
+    """Map per-pixel 15-bit colors (None for transparent) to a palette of count colors
+
+    Returns (palette of count colors or fewer, index bytes), where
+    transparent pixels get index 0 and opaque ones 1 to count. dither is
+    the ordered dithering strength, 0 to disable: the largest offset, in
+    5-bit color steps, added to or subtracted from a pixel's channels.
+    """
+    opaque = [c for c in colors if c is not None]
+    palette = median_cut(Counter(opaque), count) if opaque else []
+    nearest = NearestColor(palette, first_index=1)
+    nearest[None] = 0
+
+    if not dither:
+        return palette, bytes(map(nearest.__getitem__, colors))
+
+    # Pixels sharing a Bayer cell share an offset: shift their colors, then map them in bulk
+    indices = bytearray(len(colors))
+    height = len(colors) // width
+    for cell_y in range(4):
+        for cell_x in range(4):
+            # Thresholds span -1 to 1, so even strength 1 moves a quarter of the pixels each way
+            offset = round(((BAYER_4X4[cell_y][cell_x] + 0.5) / 8 - 1) * dither)
+            shifted = {}
+            for y in range(cell_y, height, 4):
+                start = y * width
+                row = colors[start + cell_x:start + width:4]
+                for c in set(row):
+                    if c not in shifted:
+                        shifted[c] = None if c is None else _offset_color(c, offset)
+                indices[start + cell_x:start + width:4] = bytes(
+                    map(nearest.__getitem__, map(shifted.__getitem__, row)))
+    return palette, bytes(indices)
@@ -0,0 +1,26 @@
+"""Whole-buffer conversion between byte-per-pixel tiles and packed 4bpp bytes"""
+
+# Byte lookup tables for bytes.translate
+_LOW_NIBBLE = bytes(i & 0x0F for i in range(256))
+_HIGH_NIBBLE = bytes(i >> 4 for i in range(256))
+_SHIFT_LEFT_4 = bytes((i & 0x0F) << 4 for i in range(256))
+
+
+def pack_4bpp(pixels):
+    """Pack palette indices two per byte (low nibble = left, high nibble = right)"""
+    pixels = bytes(pixels)
+    if len(pixels) % 2:
+        pixels += b'\x00'
+    left = pixels[0::2].translate(_LOW_NIBBLE)
+    right = pixels[1::2].translate(_SHIFT_LEFT_4)
+    # Nibbles never overlap, so one big-int OR combines every byte at once
+    return (int.from_bytes(left, 'little') | int.from_bytes(right, 'little')).to_bytes(len(left), 'little')
+
+
+def unpack_4bpp(packed):
+    """Unpack 4bpp bytes into one palette index per byte"""
+    packed = bytes(packed)
+    pixels = bytearray(len(packed) * 2)
+    pixels[0::2] = packed.translate(_LOW_NIBBLE)
+    pixels[1::2] = packed.translate(_HIGH_NIBBLE)
+    return pixels
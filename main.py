@@ -1,9 +1,18 @@
 import tkinter as tk
 from tkinter import Menu, Frame,filedialog
 import os
-import json
-
+import sys
+
+from formats import bin_export, c_export, c_import, gtproj, image_import
+from formats.autosave import AutosaveWorker
+from formats.journal import AutosaveJournal
+from formats.tile_codec import unpack_4bpp
+from model import optimize
+from model.history import UndoHistory
+from model.project import Project
+from ui.render_cache import RenderCache
 from ui.tileset_pane import TilesetPane
+from ui.update_scheduler import UpdateScheduler
 from ui.editor_pane import EditorPane
 from ui.palette_pane import PalettePane
 from ui.tilemap_pane import TilemapPane
@@ -24,6 +33,19 @@ class GbaTileEditor(tk.Tk):
         
         self._autosave_after_id = None
         self._last_saved_state = None
+        self.autosave = AutosaveJournal("autosave.gtproj")
+        # Encoding and disk writes happen off the Tk main loop
+        self.autosave_worker = AutosaveWorker(self.autosave, self.on_autosave_done)
+        # Closing the window saves pending changes like File > Exit
+        self.protocol("WM_DELETE_WINDOW", self.exit_save)
+
+        # Headless project model shared by all panes
+        self.project = Project()
+        # Model changes reach the tileset, painter and tilemap views once per frame
+        self.updates = UpdateScheduler(self)
+        self.updates.watch(self.project.palette, self.project.tileset, self.project.tilemap)
+        # Rendered tile images shared by the tileset and tilemap views, under one memory budget
+        self.render_cache = RenderCache()
         
         # Initialize components
         self.tileset_frame = None
@@ -33,10 +55,14 @@ class GbaTileEditor(tk.Tk):
         
         self.create_menu()
         self.create_layout()
+        self.project.tileset.add_listener(self)  # Follows the tile mode of loaded projects
         self.setup_event_bindings()
         self.load_autosave_if_exists()
         self.schedule_autosave()
 
+        # Undo covers edits made after startup; a stroke or key press is one step
+        self.history = UndoHistory(self.project)
+
     
     def create_menu(self):
         """Create the main menu bar"""
@@ -48,17 +74,46 @@ class GbaTileEditor(tk.Tk):
         file_menu.add_command(label="Load Project", command=self.load_project)
         file_menu.add_separator()
         file_menu.add_command(label="Import Palette+Tileset", command=self.import_palette_and_tileset)
+        file_menu.add_command(label="Import Tilemap", command=self.import_tilemap)
+        file_menu.add_command(label="Import Image", command=self.import_image)
         file_menu.add_separator()
         file_menu.add_command(label="Export Palette+Tileset", command=self.export_palette_and_tileset)
         file_menu.add_command(label="Export Tilemap", command=self.export_tilemap)
+        compression_menu = Menu(file_menu, tearoff=0)
+        self.compression_var = tk.StringVar(value="")
+        for label, value in (("None", ""), ("LZ77", "lz77"), ("Run-Length", "rle"), ("Huffman 4-bit", "huff4"),
+                             ("Huffman 8-bit", "huff8"), ("Smallest per Asset", "smallest")):
+            compression_menu.add_radiobutton(label=label, variable=self.compression_var, value=value)
+        file_menu.add_cascade(label="Export Compression", menu=compression_menu)
+        format_menu = Menu(file_menu, tearoff=0)
+        self.export_format_var = tk.StringVar(value="c")
+        for label, value in (("C Sources", "c"), ("Assembly + Binary (.s/.bin)", "asm"), ("Binary Only (.bin)", "bin")):
+            format_menu.add_radiobutton(label=label, variable=self.export_format_var, value=value)
+        file_menu.add_cascade(label="Export Format", menu=format_menu)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.exit_save)
         menubar.add_cascade(label="File", menu=file_menu)
+
+        # Edit menu
+        edit_menu = Menu(menubar, tearoff=0)
+        edit_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=self.undo)
+        edit_menu.add_command(label="Redo", accelerator="Ctrl+Y", command=self.redo)
+        menubar.add_cascade(label="Edit", menu=edit_menu)
+
+        # Tools menu
+        tools_menu = Menu(menubar, tearoff=0)
+        tools_menu.add_command(label="Optimize Tiles", command=self.optimize_tiles)
+        tools_menu.add_command(label="Assign Palette Banks", command=self.assign_palette_banks)
+        tools_menu.add_separator()
+        self.bpp_var = tk.BooleanVar(value=self.project.tileset.bpp == 8)
+        tools_menu.add_checkbutton(label="256-Color Tiles (8bpp)", variable=self.bpp_var, command=self.toggle_bpp)
+        menubar.add_cascade(label="Tools", menu=tools_menu)
         
         self.config(menu=menubar)
         
     def exit_save(self):
-        self.autosave_project()
+        self.autosave_worker.flush(self.project)
+        self.autosave_worker.stop()
         self.quit()
     
     def create_layout(self):
@@ -68,20 +123,21 @@ class GbaTileEditor(tk.Tk):
         main_pane.pack(fill=tk.BOTH, expand=True)
         
         # Left pane - Tileset
-        self.tileset_frame = TilesetPane(main_pane, on_tile_selected=self.on_tile_selected)
+        self.tileset_frame = TilesetPane(main_pane, self.project.tileset, on_tile_selected=self.on_tile_selected,
+                                         render_cache=self.render_cache, updates=self.updates)
         main_pane.add(self.tileset_frame, minsize=200, width=250)
         
         # Right pane - Editor and Palette
         right_pane = tk.PanedWindow(main_pane, orient=tk.VERTICAL, sashwidth=8, sashrelief=tk.RAISED)
         
         # Top right - Palette
-        self.palette_pane = PalettePane(right_pane, title="Color Palette")
+        self.palette_pane = PalettePane(right_pane, self.project.palette, title="Color Palette")
         right_pane.add(self.palette_pane, minsize=50, height=70)
         
         # Bottom right - Editor and Tilemap
         editor_container = Frame(right_pane)
         
-        self.editor_pane = EditorPane(editor_container)
+        self.editor_pane = EditorPane(editor_container, self.project.tileset, self.updates)
         self.editor_pane.pack(fill=tk.BOTH, expand=True)
         
         # Set up connections between components
@@ -91,30 +147,10 @@ class GbaTileEditor(tk.Tk):
         main_pane.add(right_pane)
         
     def load_autosave_if_exists(self):
-        if os.path.exists("autosave.gtproj"):
-            with open("autosave.gtproj", "r") as f:
-                project_data = json.load(f)
-
-                # Load palette
-                self.palette_pane.set_palette(project_data["palette"])
-                
-                # Load tiles
-                self.tileset_frame.tiles_data = project_data["tiles"]
-                self.tileset_frame.draw_tiles()
-
-                # Load tilemap (NEW)
-                self.tile_map_pane.tile_map = [
-                    [
-                        (entry["tile"], entry["flip_h"], entry["flip_v"])
-                        for entry in row
-                    ]
-                    for row in project_data["tilemap"]
-                ]
-                self.tile_map_pane.fill_empty_tiles()
-                self.tile_map_pane.draw_map()
-
-                print(f"Project loaded from {"autosave.gtproj"}")
-            print("Loaded autosave.")
+        if os.path.exists(self.autosave.snapshot_path):
+            # Panes observe the model and redraw themselves
+            replayed = self.autosave.recover(self.project)
+            print(f"Loaded autosave ({replayed} journal records replayed).")
         
     def schedule_autosave(self):
         if hasattr(self, '_autosave_after_id') and self._autosave_after_id is not None:
@@ -126,31 +162,24 @@ class GbaTileEditor(tk.Tk):
         self._autosave_after_id = self.after(10000, self.autosave_project)
     
     def autosave_project(self):
-        print("function_called")
-        autosave_path = "autosave.gtproj"
-        project_data = self.get_project_data()
-
-        safe_data = json.dumps(project_data, default=list)
-        if getattr(self, "_last_autosave_data", None) != safe_data:
-            with open(autosave_path, "w") as f:
-                f.write(safe_data)
-            self._last_autosave_data = safe_data
-            print("Autosaved project.")
+        # Only tiles, map cells and palette entries changed since the last save are written
+        if self.autosave_worker.submit(self.project):
+            self.after(50, self.poll_autosave)
         self.schedule_autosave()
 
-            
-    def get_project_data(self):
-        return {
-            "palette": self.palette_pane.palette,  # List of (r, g, b) tuples
-            "tiles": self.tileset_frame.tiles_data,  # List of 64-pixel arrays
-            "tilemap": [
-                [
-                    {"tile": tile_idx, "flip_h": flip_h, "flip_v": flip_v}
-                    for (tile_idx, flip_h, flip_v) in row
-                ]
-                for row in self.tile_map_pane.tile_map
-            ]
-        }
+    def poll_autosave(self):
+        # The worker hands results back through a queue rather than calling Tk from its thread
+        if self.autosave_worker.poll():
+            self.after(50, self.poll_autosave)
+
+    def on_autosave_done(self, written, error):
+        worker = self.autosave_worker
+        if error is not None:
+            print(f"Autosave failed: {error}")
+        else:
+            print(f"Autosaved project ({written}): main thread blocked "
+                  f"{worker.last_block_ms:.2f} ms, write took {worker.last_write_ms:.1f} ms")
+
         
     def save_project(self):
         file_path = filedialog.asksaveasfilename(
@@ -161,10 +190,7 @@ class GbaTileEditor(tk.Tk):
         if not file_path:
             return
 
-        project_data = self.get_project_data()
-
-        with open(file_path, "w") as f:
-            json.dump(project_data, f)
+        gtproj.save_project(self.project, file_path)
 
         print(f"Project saved to {file_path}")
         
@@ -176,41 +202,49 @@ class GbaTileEditor(tk.Tk):
         if not file_path:
             return
 
-        with open(file_path, "r") as f:
-            project_data = json.load(f)
-
-        # Load palette
-        self.palette_pane.set_palette(project_data["palette"])
-        
-        # Load tiles
-        self.tileset_frame.tiles_data = project_data["tiles"]
-        self.tileset_frame.draw_tiles()
-
-        # Load tilemap (NEW)
-        self.tile_map_pane.tile_map = [
-            [
-                (entry["tile"], entry["flip_h"], entry["flip_v"])
-                for entry in row
-            ]
-            for row in project_data["tilemap"]
-        ]
-        self.tile_map_pane.fill_empty_tiles()
-        self.tile_map_pane.draw_map()
+        try:
+            gtproj.load_project(file_path, self.project)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
 
         print(f"Project loaded from {file_path}")
 
-        
-    def rgb_to_gba(self, r, g, b):
-        """Convert 8-bit RGB to GBA 15-bit color (0BBBBBGG GGGRRRRR)"""
-        r5 = (r >> 3) & 0x1F
-        g5 = (g >> 3) & 0x1F
-        b5 = (b >> 3) & 0x1F
-        return (b5 << 10) | (g5 << 5) | r5
-    
-    def import_palette_and_tileset(self):
-        from tkinter import filedialog
-        import re
 
+    def optimize_tiles(self):
+        """Merge duplicate and mirrored tiles as one undoable step"""
+        self.history.checkpoint()
+        result = optimize.optimize_tiles(self.project)
+        self.history.checkpoint()
+        print(f"Optimized tiles: {result}")
+
+    def toggle_bpp(self):
+        """Switch the project between 4bpp and 8bpp tiles"""
+        bpp = 8 if self.bpp_var.get() else 4
+        try:
+            self.project.tileset.set_bpp(bpp)
+        except ValueError as e:
+            self.bpp_var.set(self.project.tileset.bpp == 8)
+            print(f"Error: {e}")
+            return
+        print(f"Tiles are now {bpp}bpp.")
+
+    def on_bpp_changed(self, bpp):
+        self.bpp_var.set(bpp == 8)
+        self.palette_pane.set_bpp(bpp)
+
+    def assign_palette_banks(self):
+        """Repack the tiles' colors into the fewest palette banks as one undoable step"""
+        self.history.checkpoint()
+        try:
+            result = optimize.assign_palette_banks(self.project)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        self.history.checkpoint()
+        print(f"Assigned palette banks: {result}")
+
+    def import_palette_and_tileset(self):
         file_path = filedialog.askopenfilename(
             title="Import visual_data.c",
             filetypes=[("C Source File", "*.c"), ("All files", "*.*")]
@@ -218,194 +252,105 @@ class GbaTileEditor(tk.Tk):
         if not file_path:
             return
 
-        with open(file_path, "r") as f:
-            content = f.read()
+        try:
+            palette, tile_bytes, bpp = c_import.read_visual_data(file_path)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
 
-        # Extract palette (16 entries)
-        palette_matches = re.findall(r"0x([0-9A-Fa-f]{4})", content)
-        if len(palette_matches) < 16:
+        if len(palette) < 16:
             print("Error: Not enough palette entries found.")
             return
 
-        def gba_to_rgb(color):
-            val = int(color, 16)
-            r = (val & 0x1F) << 3
-            g = ((val >> 5) & 0x1F) << 3
-            b = ((val >> 10) & 0x1F) << 3
-            return (r, g, b)
-
-        palette = [gba_to_rgb(c) for c in palette_matches[:16]]
-        self.palette_pane.set_palette(palette)
-        self.tileset_frame.set_palette(palette)
-        self.editor_pane.tile_painter.set_palette(palette)
-
-        # Extract tileset bytes
-        tileset_data_match = re.search(
-            r"const u8 tile_set\[\s*TILE_COUNT\s*\*\s*TILE_SIZE\s*\]\s*=\s*\{(.*?)\};",
-            content, re.DOTALL
+        self.project.palette.load_gba(palette)  # One or more banks of 16 colors
+
+        # The file's tile mode decides the layout, and the editor switches to it
+        if bpp == 8:
+            self.project.tileset.load_bytes(tile_bytes)  # Already one pixel per byte
+        else:
+            # Convert bytes to tile format: 2 pixels per byte (low nibble = left, high nibble = right)
+            self.project.tileset.load_bytes(unpack_4bpp(tile_bytes))
+        self.project.tileset.set_bpp(bpp)
+
+        print(f"Imported {len(self.project.tileset)} tiles and a palette from C file.")
+
+    def import_image(self):
+        file_path = filedialog.askopenfilename(
+            title="Import Image",
+            filetypes=[("PNG Image", "*.png"), ("All files", "*.*")]
         )
+        if not file_path:
+            return
 
-        if not tileset_data_match:
-            print("Error: Could not find tile_set data.")
+        try:
+            result = image_import.import_image(self.project, file_path)
+        except ValueError as e:
+            print(f"Error: {e}")
             return
 
-        tile_bytes = re.findall(r"0x([0-9A-Fa-f]{2})", tileset_data_match.group(1))
-        tile_bytes = [int(b, 16) for b in tile_bytes]
+        print(f"Imported {result} from image.")
 
-        # Convert bytes to tile format: 2 pixels per byte (low nibble = left, high nibble = right)
-        tiles = []
-        for i in range(0, len(tile_bytes), 32):  # 8x8 = 64 pixels = 32 bytes
-            tile = []
-            for byte in tile_bytes[i:i+32]:
-                left = byte & 0x0F
-                right = (byte >> 4) & 0x0F
-                tile.extend([left, right])
-            tiles.append(tile[:64])
-            
-        while len(tiles) < 512:
-            tiles.append([0] * 64)
+    def import_tilemap(self):
+        file_path = filedialog.askopenfilename(
+            title="Import Tilemap",
+            filetypes=[("C Source File", "*.c"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+
+        try:
+            width, entries = c_import.read_tilemap(file_path)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
 
-        self.tileset_frame.tiles_data = tiles
-        self.tileset_frame.draw_tiles()
+        # Take the file's dimensions, as load_entries drops cells outside the map; the pane's size boxes follow
+        width = max(width, 1)
+        height = max((len(entries) + width - 1) // width, 1)
+        self.project.tilemap.resize(width, height)
+        self.project.tilemap.load_entries(entries, width)
+        self.project.tilemap.clamp_tiles(len(self.project.tileset))
 
-        print(f"Imported {len(tiles)} tiles and a palette from C file.")
+        print(f"Imported a {width}x{height} tilemap from C file.")
 
 
     def export_palette_and_tileset(self):
         """Export palette and tileset to GBA-compatible C files, only including non-empty tiles"""
-        from tkinter import filedialog
-        import os
-        
         # Ask for output directory
         output_dir = filedialog.askdirectory(title="Select output directory")
         if not output_dir:
             return
-        
-        # Find last non-empty tile
-        last_non_empty = 0
-        for i, tile in enumerate(self.tileset_frame.tiles_data):
-            if any(pixel != 0 for pixel in tile):  # Check if tile is non-empty
-                last_non_empty = i
-        
-        # Export palette (always all 16 colors)
-        palette_path = os.path.join(output_dir, "visual_data.c")
-        with open(palette_path, 'w') as f:
-            f.write("#include \"visual_data.h\"\n\n")
-            f.write("// Palette data\n")
-            f.write("const u16 palette[16] = \n{\n")
-            
-            r, g, b = self.palette_pane.palette[0]
-            gba_color_1 = self.rgb_to_gba(r, g, b)
-                
-            # First color is transparent
-            f.write("    0x%04X, // Transparent\n" % gba_color_1)
-            
-            # Remaining colors
-            for i, color in enumerate(self.palette_pane.palette[1:], 1):
-                r, g, b = color
-                gba_color = self.rgb_to_gba(r, g, b)
-                f.write("    0x%04X, // Color %d\n" % (gba_color, i))
-            f.write("};\n\n")
-            
-            # Export tileset (only up to last non-empty tile)
-            f.write("// Tileset data (each byte = 2 pixels, right then left)\n")
-            f.write("const u8 tile_set[TILE_COUNT * TILE_SIZE] = \n{\n")
-            
-            for tile_idx, tile in enumerate(self.tileset_frame.tiles_data[:last_non_empty + 1]):
-                f.write("    // Tile %d\n    " % tile_idx)
-                
-                # Pack 2 pixels per byte (right then left)
-                for i in range(0, len(tile), 2):
-                    if i+1 < len(tile):
-                        byte_val = (tile[i+1] << 4) | tile[i]
-                    else:
-                        byte_val = tile[i]
-                    
-                    f.write("0x%02X, " % byte_val)
-                
-                f.write("\n")
-            
-            f.write("};\n")
-        
-        # Create header file
-        header_path = os.path.join(output_dir, "visual_data.h")
-        with open(header_path, 'w') as f:
-            f.write("#ifndef VISUAL_DATA_H\n")
-            f.write("#define VISUAL_DATA_H\n\n")
-            f.write("#include \"visual.h\"\n\n")
-            f.write("\n#define PALETTE_COUNT 16\n")
-            f.write("#define TILE_COUNT %d\n" % (last_non_empty + 1))
-            f.write("#define TILE_SIZE %d\n" % self.tileset_frame.TILE_SIZE)
-            f.write("extern const u16 palette[16];\n")
-            f.write("extern const u8 tile_set[TILE_COUNT * TILE_SIZE];\n")
-            f.write("#endif")
+
+        compression = self.compression_var.get() or None
+        output_format = self.export_format_var.get()
+        if output_format == "c":
+            c_export.export_palette_and_tileset(self.project, output_dir, compression)
+        else:
+            bin_export.export_palette_and_tileset(self.project, output_dir, compression, output_format == "asm")
 
     def export_tilemap(self):
         """Export tilemap to GBA-compatible C file, only including used area"""
-        from tkinter import filedialog
-        import os
-        
         # Ask for output file
+        output_format = self.export_format_var.get()
+        if output_format == "c":
+            extension, filetypes = ".c", [("C files", "*.c"), ("All files", "*.*")]
+        elif output_format == "asm":
+            extension, filetypes = ".s", [("Assembly files", "*.s"), ("All files", "*.*")]
+        else:
+            extension, filetypes = ".bin", [("Binary files", "*.bin"), ("All files", "*.*")]
         output_path = filedialog.asksaveasfilename(
             title="Export Tilemap",
-            defaultextension=".c",
-            filetypes=[("C files", "*.c"), ("All files", "*.*")]
+            defaultextension=extension,
+            filetypes=filetypes
         )
         if not output_path:
             return
-        
-        base_path = os.path.splitext(output_path)[0]
-        header_path = base_path + ".h"
-        name = os.path.splitext(os.path.basename(output_path))[0]
-        
-        # Find used tiles and boundaries
-        max_x = 0
-        max_y = 0
-        used_tiles = set()
-        
-        for y in range(self.tile_map_pane.tile_map_height):
-            for x in range(self.tile_map_pane.tile_map_width):
-                tile_idx, flip_h, flip_v = self.tile_map_pane.tile_map[y][x]
-                if tile_idx != 0:  # Only count non-zero tiles
-                    used_tiles.add(tile_idx)
-                    if x > max_x:
-                        max_x = x
-                    if y > max_y:
-                        max_y = y
-        
-        # Adjust dimensions (add 1 because we want count, not index)
-        map_width = max_x + 1 if max_x > 0 else 1  # Minimum 1x1
-        map_height = max_y + 1 if max_y > 0 else 1
-        
-        # Find last used tile index
-        last_used_tile = max(used_tiles) if used_tiles else 0
-        
-        # Write tilemap C file
-        with open(output_path, 'w') as f:
-            f.write("#include \"%s.h\"\n\n" % name)
-            f.write("// Tilemap data\n")
-            f.write("const u16 tile_map[%d * %d] = \n{\n" % (map_width, map_height))
-            
-            for y in range(map_height):
-                for x in range(map_width):
-                    tile_idx, flip_h, flip_v = self.tile_map_pane.tile_map[y][x]
-                    f.write("    TILE_ENTRY(%d, 0, %d, %d)," % 
-                        (tile_idx, int(flip_h), int(flip_v)))
-                
-                f.write("\n")
-            
-            f.write("};\n")
-        
-        # Write tilemap header file
-        with open(header_path, 'w') as f:
-            f.write("#ifndef %s_H\n" % name.upper())
-            f.write("#define %s_H\n\n" % name.upper())
-            f.write("#include \"visual.h\"\n\n")
-            f.write("extern const u16 tile_map[%d * %d];\n" % (map_width, map_height))
-            f.write("\n#define TILE_MAP_WIDTH %d\n" % map_width)
-            f.write("#define TILE_MAP_HEIGHT %d\n" % map_height)
-            f.write("#define LAST_USED_TILE %d\n" % last_used_tile)
-            f.write("#endif")
+
+        compression = self.compression_var.get() or None
+        if output_format == "c":
+            c_export.export_tilemap(self.project, output_path, compression)
+        else:
+            bin_export.export_tilemap(self.project, output_path, compression, output_format == "asm")
 
     def setup_component_connections(self):
         """Connect all the UI components together"""
@@ -418,16 +363,18 @@ class GbaTileEditor(tk.Tk):
         self.editor_pane.tile_painter.set_palette(self.palette_pane.palette)
         self.editor_pane.tile_painter.set_active_color_index(self.palette_pane.active_index)
         
-        # Set up tile update callback
-        self.editor_pane.tile_painter.set_on_tile_updated(self.on_tile_updated)
-        
         # Create tilemap pane
         self.tile_map_pane = TilemapPane(
             self.editor_pane.mapper_tab, 
-            tile_data_source=self.tileset_frame, 
-            palette_source=self.palette_pane
+            self.project.tilemap,
+            self.project.tileset,
+            self.project.palette,
+            tile_data_source=self.tileset_frame,
+            render_cache=self.render_cache,
+            updates=self.updates
         )
         self.tile_map_pane.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.palette_pane.add_listener(self.tile_map_pane)  # Placed tiles use the selected bank
     
     def setup_event_bindings(self):
         """Set up keyboard shortcuts and other event bindings"""
@@ -439,6 +386,21 @@ class GbaTileEditor(tk.Tk):
         # Common shortcuts        
         self.bind("<Control-s>", lambda e: self.save_project())
         self.bind("<Control-o>", lambda e: self.load_project())
+        self.bind_all("<Control-z>", lambda e: self.undo())
+        self.bind_all("<Control-y>", lambda e: self.redo())
+        self.bind_all("<Control-Z>", lambda e: self.redo())  # Ctrl+Shift+Z
+
+        # Releasing the mouse or a key ends the current undo step
+        self.bind_all("<ButtonRelease-1>", lambda e: self.history.checkpoint(), add='+')
+        self.bind_all("<KeyRelease>", lambda e: self.history.checkpoint(), add='+')
+
+    def undo(self):
+        if not self.history.undo():
+            print("Nothing to undo.")
+
+    def redo(self):
+        if not self.history.redo():
+            print("Nothing to redo.")
     
     def on_ctrl_mousewheel(self, event):
         """Handle Ctrl+MouseWheel for zooming"""
@@ -447,19 +409,16 @@ class GbaTileEditor(tk.Tk):
         else:
             self.tileset_frame.zoom_out()
     
-    def on_tile_selected(self, index, pixels):
+    def on_tile_selected(self, index):
         """Handle tile selection from tileset"""
-        self.editor_pane.tile_painter.load_tile(pixels, tile_index=index)
-    
-    def on_tile_updated(self, new_pixels):
-        """Handle tile updates from editor"""
-        idx = self.editor_pane.tile_painter.current_tile_index
-        if 0 <= idx < len(self.tileset_frame.tiles_data):
-            self.tileset_frame.tiles_data[idx] = new_pixels
-            self.tileset_frame.draw_tiles()
-            self.tile_map_pane.notify_tile_update(idx)  # Update tilemap if this tile is used
+        self.editor_pane.tile_painter.load_tile(index)
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Headless commands, e.g. "main.py export level1.gtproj"
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+
     app = GbaTileEditor()
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,179 @@
+from array import array
+from collections import deque
+
+from model.tilemap import ALL_CELLS, CHUNK_CELLS, CHUNK_SIZE
+from model.tileset import TILE_PIXELS
+
+
+class UndoHistory:
+    """Project-wide undo/redo of palette, tile pixel and tilemap edits
+
+    Listens to the project's models and keeps a shadow copy of their
+    data, so each notification can be turned into (index, old, new)
+    diffs. Diffs collected until checkpoint() form one step, stored as
+    compact arrays in a ring buffer that drops the oldest steps beyond
+    budget_bytes. Undo and redo go through the models' bulk update()
+    methods, so views refresh only what changed. Whole-map reloads reset
+    the history.
+    """
+
+    STEP_OVERHEAD = 64  # Rough bytes per step besides its arrays
+
+    def __init__(self, project, budget_bytes=4 * 1024 * 1024):
+        self.project = project
+        self.budget_bytes = budget_bytes
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self.bytes = 0  # Size of undo_steps
+        self._applying = False
+        self.reset()
+        for model in (project.palette, project.tileset, project.tilemap):
+            model.add_listener(self)
+
+    def reset(self):
+        """Forget all steps and resynchronize with the current project data"""
+        self.undo_steps.clear()
+        self.redo_steps = []
+        self.bytes = 0
+        self._palette = array('H', self.project.palette.colors)
+        self._pixels = bytearray(self.project.tileset.data)
+        # Map shadow in the model's chunk layout, so resetting copies arrays rather than visiting cells
+        self._chunks = {key: array('H', chunk) for key, chunk in self.project.tilemap.chunks.items()}
+        self._pending = ({}, {}, {})  # Index -> value before the step, per palette / pixels / map
+
+    def _shadow_entry(self, offset):
+        """Map entry at a row-major offset as of the last notification"""
+        width = self.project.tilemap.width
+        x, y = offset % width, offset // width
+        chunk = self._chunks.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+        if chunk is None:
+            return 0
+        return chunk[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE]
+
+    def can_undo(self):
+        return bool(self.undo_steps) or any(self._pending)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def on_bpp_changed(self, bpp):
+        self.reset()  # Steps from the other mode could restore pixels it cannot hold
+
+    def on_palette_entries_changed(self, indices):
+        colors = self.project.palette.colors
+        pending = self._pending[0]
+        for index in indices:
+            if not self._applying:
+                pending.setdefault(index, self._palette[index])
+            self._palette[index] = colors[index]
+
+    def on_tiles_changed(self, indices):
+        data = self.project.tileset.data
+        pending = self._pending[1]
+        for index in indices:
+            start = index * TILE_PIXELS
+            end = start + TILE_PIXELS
+            if self._pixels[start:end] == data[start:end]:
+                continue
+            if not self._applying:
+                for offset in range(start, end):
+                    if self._pixels[offset] != data[offset]:
+                        pending.setdefault(offset, self._pixels[offset])
+            self._pixels[start:end] = data[start:end]
+
+    def on_cells_changed(self, cells):
+        if cells is ALL_CELLS:
+            self.reset()  # Loads and resizes invalidate offsets, so they are not undoable
+            return
+        tilemap = self.project.tilemap
+        pending = self._pending[2]
+        for x, y in cells:
+            key = (x // CHUNK_SIZE, y // CHUNK_SIZE)
+            i = (y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE
+            chunk = self._chunks.get(key)
+            old = chunk[i] if chunk is not None else 0
+            if not self._applying:
+                pending.setdefault(y * tilemap.width + x, old)
+            entry = tilemap.get_entry(x, y)
+            if entry != old:
+                if chunk is None:
+                    chunk = self._chunks[key] = array('H', bytes(CHUNK_CELLS * 2))
+                chunk[i] = entry
+
+    def checkpoint(self):
+        """Close the current step, e.g. at the end of a stroke; returns False if nothing changed"""
+        palette, pixels, entries = self._pending
+        self._pending = ({}, {}, {})
+        step = (
+            self._diff(palette, self._palette.__getitem__, 'B', 'H'),
+            self._diff(pixels, self._pixels.__getitem__, 'I', 'B'),
+            self._diff(entries, self._shadow_entry, 'I', 'H'),
+        )
+        if not any(step):
+            return False
+
+        self.redo_steps = []
+        self._push(step)
+        return True
+
+    @staticmethod
+    def _diff(pending, current, index_type, value_type):
+        """Return (indices, old values, new values) arrays for entries that really changed, or None"""
+        changed = sorted(index for index, old in pending.items() if current(index) != old)
+        if not changed:
+            return None
+        return (array(index_type, changed),
+                array(value_type, [pending[index] for index in changed]),
+                array(value_type, [current(index) for index in changed]))
+
+    @classmethod
+    def _step_size(cls, step):
+        return cls.STEP_OVERHEAD + sum(a.itemsize * len(a) for diff in step if diff for a in diff)
+
+    def _push(self, step):
+        self.undo_steps.append(step)
+        self.bytes += self._step_size(step)
+        while self.bytes > self.budget_bytes and len(self.undo_steps) > 1:
+            self.bytes -= self._step_size(self.undo_steps.popleft())
+
+    def undo(self):
+        """Revert the last step, returning False if there is none"""
+        self.checkpoint()
+        if not self.undo_steps:
+            return False
+        step = self.undo_steps.pop()
+        self.bytes -= self._step_size(step)
+        self._apply(step, 1)
+        self.redo_steps.append(step)
+        return True
+
+    def redo(self):
+        """Reapply the last undone step, returning False if there is none"""
+        self.checkpoint()
+        if not self.redo_steps:
+            return False
+        step = self.redo_steps.pop()
+        self._apply(step, 2)
+        self._push(step)
+        return True
+
+    def _apply(self, step, which):
+        """Write the old (which=1) or new (which=2) values of a step through the models"""
+        palette, pixels, entries = step
+        self._applying = True
+        try:
+            if palette:
+                self.project.palette.update(palette[0], palette[which])
+            if pixels:
+                tileset = self.project.tileset
+                tiles = {}
+                for offset, value in zip(pixels[0], pixels[which]):
+                    index = offset // TILE_PIXELS
+                    if index not in tiles:
+                        tiles[index] = bytearray(tileset.tile_view(index))
+                    tiles[index][offset % TILE_PIXELS] = value
+                tileset.update(list(tiles), b"".join(tiles.values()))
+            if entries:
+                self.project.tilemap.update(entries[0], entries[which])
+        finally:
+            self._applying = False
@@ -0,0 +1,239 @@
+from model.palette import BANK_COUNT, PALETTE_SIZE
+from model.tilemap import FLIP_H, FLIP_V, TILE_MASK, entry_palbank, make_entry, split_entry
+from model.tileset import TILE_PIXELS, TILE_SIZE
+
+def flip_tile(pixels, flip_h=False, flip_v=False):
+    """Return a tile's 64 pixels mirrored horizontally and/or vertically"""
+    pixels = bytes(pixels)
+    if flip_h and flip_v:
+        return pixels[::-1]
+    if flip_v:
+        return b"".join(pixels[y * TILE_SIZE:(y + 1) * TILE_SIZE] for y in reversed(range(TILE_SIZE)))
+    if flip_h:
+        return flip_tile(pixels[::-1], flip_v=True)
+    return pixels
+
+
+class OptimizeResult:
+    """Summary of an optimize_tiles() run"""
+
+    def __init__(self, tiles_before, tiles_after, remap, cells_changed, tile_bytes=TILE_PIXELS // 2):
+        self.tiles_before = tiles_before  # Exported tile count before, i.e. up to the last non-empty tile
+        self.tiles_after = tiles_after
+        self.remap = remap  # Old tile index -> (new index, flip_h, flip_v)
+        self.cells_changed = cells_changed
+        self.tile_bytes = tile_bytes  # VRAM bytes per exported tile
+
+    @property
+    def vram_saved(self):
+        """Bytes of tile data no longer exported"""
+        return (self.tiles_before - self.tiles_after) * self.tile_bytes
+
+    def __str__(self):
+        return (f"{self.tiles_before} tiles -> {self.tiles_after} tiles, "
+                f"{self.vram_saved} bytes of VRAM saved, {self.cells_changed} map cells rewritten")
+
+
+class TileIndex:
+    """Hash index of unique tiles that also matches their H, V and HV mirrors
+
+    Every added tile goes into one dict under its own pixel bytes and those
+    of its three mirrors, so each lookup is a single dict access.
+    """
+
+    def __init__(self):
+        self.tiles = []  # Unique tiles in the order they were added
+        self._index = {}  # Pixel bytes -> (position in tiles, flip_h, flip_v) producing them
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def add(self, pixels):
+        """Return (position, flip_h, flip_v) of a matching tile, adding the tile if there is none"""
+        pixels = bytes(pixels)
+        match = self._index.get(pixels)
+        if match is not None:
+            return match
+        position = len(self.tiles)
+        self.tiles.append(pixels)
+        for flip_h, flip_v in ((False, False), (True, False), (False, True), (True, True)):
+            self._index.setdefault(flip_tile(pixels, flip_h, flip_v), (position, flip_h, flip_v))
+        return position, False, False
+
+
+def find_duplicates(tileset):
+    """Map each tile up to the last non-empty one onto the first tile equal to it up to flips
+
+    Returns (unique tile indices in order, {old index: (position in unique, flip_h, flip_v)}).
+    """
+    index = TileIndex()
+    unique = []
+    remap = {}
+    for tile_index in range(tileset.last_non_empty() + 1):
+        count = len(index)
+        remap[tile_index] = index.add(tileset.tile_view(tile_index))
+        if len(index) > count:
+            unique.append(tile_index)
+    return unique, remap
+
+
+def optimize_tiles(project):
+    """Collapse duplicate and mirrored tiles, compact the tileset and rewrite map entries
+
+    Map entries keep their palette bank; their flip bits are combined with
+    the flip that maps the kept tile onto the removed one. Changes go
+    through the models' bulk update methods, so they can be undone.
+    """
+    tileset = project.tileset
+    tilemap = project.tilemap
+    tiles_before = tileset.last_non_empty() + 1
+    unique, remap = find_duplicates(tileset)
+
+    # Compact the kept tiles to the front and clear the freed slots
+    changed_tiles = []
+    pixels = []
+    for position in range(tiles_before):
+        new = tileset.get_tile(unique[position]) if position < len(unique) else bytes(TILE_PIXELS)
+        if new != tileset.get_tile(position):
+            changed_tiles.append(position)
+            pixels.append(new)
+
+    offsets = []
+    entries = []
+    for x, y, entry in list(tilemap.iter_used_cells()):
+        tile_index = entry & TILE_MASK
+        if tile_index not in remap:
+            continue  # Empty tile past the end of the tileset
+        position, flip_h, flip_v = remap[tile_index]
+        new_entry = (entry & ~(TILE_MASK | FLIP_H | FLIP_V)) | position
+        new_entry |= (entry & FLIP_H) ^ (FLIP_H if flip_h else 0)
+        new_entry |= (entry & FLIP_V) ^ (FLIP_V if flip_v else 0)
+        if new_entry != entry:
+            offsets.append(y * tilemap.width + x)
+            entries.append(new_entry)
+
+    if changed_tiles:
+        tileset.update(changed_tiles, b"".join(pixels))
+    if offsets:
+        tilemap.update(offsets, entries)
+
+    return OptimizeResult(tiles_before, tileset.last_non_empty() + 1, remap, len(offsets), tileset.tile_bytes)
+
+
+def pack_palette_banks(color_sets, capacity=PALETTE_SIZE - 1, max_banks=BANK_COUNT):
+    """Pack sets of colors into as few banks of capacity colors as a greedy best fit finds
+
+    Sets are placed largest first into the bank that needs the fewest new
+    colors, preferring fuller banks on ties, and open a new bank when none
+    has room. Returns (list of banks as color lists, bank index per input
+    set), or None if a set is too large or more than max_banks are needed.
+    """
+    banks = []  # Color sets
+    placed = {}  # frozenset -> bank index
+    for colors in sorted(set(map(frozenset, color_sets)), key=len, reverse=True):
+        if len(colors) > capacity:
+            return None
+        best = None
+        for i, bank in enumerate(banks):
+            added = len(colors - bank)
+            if len(bank) + added <= capacity and (best is None or (added, -len(bank)) < best[0]):
+                best = ((added, -len(bank)), i)
+        if best is None:
+            if len(banks) == max_banks:
+                return None
+            banks.append(set())
+            best = (None, len(banks) - 1)
+        banks[best[1]] |= colors
+        placed[colors] = best[1]
+    return [sorted(bank) for bank in banks], [placed[frozenset(colors)] for colors in color_sets]
+
+
+class BankResult:
+    """Summary of an assign_palette_banks() run"""
+
+    def __init__(self, banks_before, banks_after, tiles_added, cells_changed):
+        self.banks_before = banks_before
+        self.banks_after = banks_after
+        self.tiles_added = tiles_added  # Tiles split because cells showed them with different colors
+        self.cells_changed = cells_changed
+
+    def __str__(self):
+        return (f"{self.banks_before} palette banks -> {self.banks_after}, "
+                f"{self.tiles_added} tiles added, {self.cells_changed} map cells rewritten")
+
+
+def assign_palette_banks(project):
+    """Repack the colors each tile shows into the fewest banks and give every cell its bank
+
+    A tile shown with different banks, or whose pixels end up indexing
+    different bank layouts, is split into extra tiles. Index 0 stays
+    transparent in every bank and bank 0 keeps the backdrop color. Raises
+    ValueError if the colors do not fit 16 banks or the tiles do not fit
+    the tileset; the project is left unchanged then.
+    """
+    palette = project.palette
+    tileset = project.tileset
+    tilemap = project.tilemap
+    if tileset.bpp != 4:
+        raise ValueError("Palette banks only apply to 4bpp tiles")
+
+    # A unit is a tile shown with one bank; unused tiles count as shown with bank 0
+    cells = {}  # (tile, bank) -> [(offset, entry)]
+    for x, y, entry in tilemap.iter_used_cells():
+        tile_index = entry & TILE_MASK
+        if tile_index < len(tileset):
+            cells.setdefault((tile_index, entry_palbank(entry)), []).append((y * tilemap.width + x, entry))
+    used = {tile_index for tile_index, _ in cells}
+    units = list(cells) + [(t, 0) for t in range(tileset.last_non_empty() + 1)
+                           if t not in used and not tileset.is_empty(t)]
+
+    unit_colors = []
+    for tile_index, bank in units:
+        base = bank * PALETTE_SIZE
+        unit_colors.append({palette.colors[base + p] for p in set(tileset.tile_view(tile_index)) if p})
+    packed = pack_palette_banks(unit_colors)
+    if packed is None:
+        raise ValueError("Tile colors do not fit in %d palette banks" % BANK_COUNT)
+    banks, unit_banks = packed
+    positions = [{color: i + 1 for i, color in enumerate(bank)} for bank in banks]
+
+    # Recolor each unit; the first version of a tile keeps its slot, other versions go after every
+    # tile a unit or map cell uses, so they never land on an empty tile that is placed on the map
+    first_free = next_free = max([tileset.last_non_empty()] + [tile_index for tile_index, _ in units]) + 1
+    slots = {}  # (tile, new pixels) -> tile index
+    new_tiles = {}  # Tile index -> new pixels
+    offsets = []
+    entries = []
+    for (tile_index, bank), new_bank in zip(units, unit_banks):
+        old_base = bank * PALETTE_SIZE
+        # Only the colors this tile uses are in its new bank
+        lookup = [0] + [positions[new_bank].get(palette.colors[old_base + p], 0) for p in range(1, PALETTE_SIZE)]
+        pixels = bytes(lookup[p] if p < PALETTE_SIZE else 0 for p in tileset.tile_view(tile_index))
+        slot = slots.get((tile_index, pixels))
+        if slot is None:
+            slot = tile_index if tile_index not in new_tiles else next_free
+            next_free += slot != tile_index
+            slots[(tile_index, pixels)] = slot
+            new_tiles[slot] = pixels
+        for offset, entry in cells.get((tile_index, bank), ()):
+            _, flip_h, flip_v = split_entry(entry)
+            new_entry = make_entry(slot, flip_h, flip_v, new_bank)
+            if new_entry != entry:
+                offsets.append(offset)
+                entries.append(new_entry)
+    if next_free > len(tileset):
+        raise ValueError("Splitting tiles by bank needs %d tiles, the tileset holds %d" % (next_free, len(tileset)))
+
+    colors = [palette.colors[0]] + [0] * (len(palette) - 1)
+    for bank, bank_colors in enumerate(banks):
+        colors[bank * PALETTE_SIZE + 1:bank * PALETTE_SIZE + 1 + len(bank_colors)] = bank_colors
+
+    banks_before = len({bank for _, bank in cells} | {0})
+    changed = [slot for slot, pixels in sorted(new_tiles.items()) if pixels != tileset.get_tile(slot)]
+    if list(palette.colors) != colors:
+        palette.update(range(len(colors)), colors)
+    if changed:
+        tileset.update(changed, b"".join(new_tiles[slot] for slot in changed))
+    if offsets:
+        tilemap.update(offsets, entries)
+    return BankResult(banks_before, max(1, len(banks)), next_free - first_free, len(offsets))
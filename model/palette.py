@@ -0,0 +1,103 @@
+from array import array
+
+PALETTE_SIZE = 16  # Standard 16-color palette
+BANK_COUNT = 16  # 4bpp tiles pick one of 16 palette banks of PALETTE_SIZE colors
+
+
+def rgb_to_gba(r, g, b):
+    """Convert 8-bit RGB to GBA 15-bit color (0BBBBBGG GGGRRRRR)"""
+    r5 = (r >> 3) & 0x1F
+    g5 = (g >> 3) & 0x1F
+    b5 = (b >> 3) & 0x1F
+    return (b5 << 10) | (g5 << 5) | r5
+
+
+def gba_to_rgb(color):
+    """Convert GBA 15-bit color to an 8-bit RGB tuple"""
+    r = (color & 0x1F) << 3
+    g = ((color >> 5) & 0x1F) << 3
+    b = ((color >> 10) & 0x1F) << 3
+    return (r, g, b)
+
+
+class Palette:
+    """Background palette RAM stored as GBA 15-bit color values, bank after bank"""
+
+    def __init__(self, size=PALETTE_SIZE * BANK_COUNT):
+        self.colors = array('H', [0] * size)
+        self.version = 0
+        self.dirty = set()  # Entries changed since the last take_dirty()
+        self.listeners = []
+
+    def __len__(self):
+        return len(self.colors)
+
+    def add_listener(self, listener):
+        """Add a listener to be notified of palette changes"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Remove a listener from notification list"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(self, indices):
+        """Bump the version and tell listeners which entries changed"""
+        self.version += 1
+        self.dirty.update(indices)
+        for listener in self.listeners:
+            if hasattr(listener, 'on_palette_entries_changed'):
+                listener.on_palette_entries_changed(indices)
+
+    def take_dirty(self):
+        """Return and clear the set of entries changed since the last call"""
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    def update(self, indices, values):
+        """Set several entries to 15-bit values with a single notification"""
+        for index, value in zip(indices, values):
+            self.colors[index] = value & 0x7FFF
+        self.notify(list(indices))
+
+    def get_gba(self, index):
+        return self.colors[index]
+
+    def set_gba(self, index, value):
+        value &= 0x7FFF
+        if self.colors[index] != value:
+            self.colors[index] = value
+            self.notify([index])
+
+    def get_rgb(self, index):
+        return gba_to_rgb(self.colors[index])
+
+    def set_rgb(self, index, rgb):
+        r, g, b = map(int, rgb)
+        self.set_gba(index, rgb_to_gba(r, g, b))
+
+    def to_rgb_list(self):
+        """Return the palette as a list of 8-bit (r, g, b) tuples"""
+        return [gba_to_rgb(c) for c in self.colors]
+
+    def bank_rgb_list(self, bank):
+        """Return the PALETTE_SIZE colors of one bank as 8-bit (r, g, b) tuples"""
+        return [gba_to_rgb(c) for c in self.colors[bank * PALETTE_SIZE:(bank + 1) * PALETTE_SIZE]]
+
+    def last_used_bank(self):
+        """Index of the last bank with any non-black color (0 if none)"""
+        for bank in reversed(range(len(self.colors) // PALETTE_SIZE)):
+            if any(self.colors[bank * PALETTE_SIZE:(bank + 1) * PALETTE_SIZE]):
+                return bank
+        return 0
+
+    def load_gba(self, values):
+        """Replace the whole palette with 15-bit values, clearing entries past the end of values"""
+        count = min(len(values), len(self.colors))
+        self.colors[:] = array('H', [v & 0x7FFF for v in values[:count]] + [0] * (len(self.colors) - count))
+        self.notify(range(len(self.colors)))
+
+    def load_rgb(self, colors):
+        """Replace the whole palette with 8-bit (r, g, b) colors"""
+        self.load_gba([rgb_to_gba(*map(int, c)) for c in colors])
@@ -0,0 +1,56 @@
+from array import array
+
+from model.palette import Palette
+from model.tileset import Tileset
+from model.tilemap import ALL_CELLS, Tilemap
+
+
+class Project:
+    """Palette, tileset and tilemap of one editor project, independent of Tk"""
+
+    def __init__(self):
+        self.palette = Palette()
+        self.tileset = Tileset()
+        self.tilemap = Tilemap()
+
+    def take_dirty(self):
+        """Return and clear (palette entries, tiles, map offsets) changed since the last call"""
+        return (self.palette.take_dirty(), self.tileset.take_dirty(), self.tilemap.take_dirty())
+
+    def restore_dirty(self, dirty):
+        """Mark changes returned by take_dirty() as pending again, e.g. after a failed save"""
+        palette_indices, tile_indices, map_offsets = dirty
+        self.palette.dirty |= palette_indices
+        self.tileset.dirty |= tile_indices
+        if map_offsets is ALL_CELLS or self.tilemap.dirty is ALL_CELLS:
+            self.tilemap.dirty = ALL_CELLS
+        else:
+            self.tilemap.dirty |= map_offsets
+
+    def copy(self):
+        """Return a detached copy of the data, without listeners, safe to hand to another thread"""
+        project = Project()
+        project.palette.colors = array('H', self.palette.colors)
+        project.tileset.tile_count = self.tileset.tile_count
+        project.tileset.bpp = self.tileset.bpp
+        project.tileset.data = bytearray(self.tileset.data)
+        project.tilemap = self.tilemap.copy()
+        return project
+
+    def load_dict(self, project_data):
+        """Load a project from the legacy JSON .gtproj layout, which binary files replaced
+
+        JSON projects predate palette banks and 8bpp tiles: cells use bank 0
+        and tiles are 4bpp.
+        """
+        self.palette.load_rgb(project_data["palette"])
+        self.tileset.load_lists(project_data["tiles"])
+        self.tileset.set_bpp(4)
+        self.tilemap.load_cells([
+            [
+                (entry["tile"], entry["flip_h"], entry["flip_v"])
+                for entry in row
+            ]
+            for row in project_data["tilemap"]
+        ])
+        self.tilemap.clamp_tiles(len(self.tileset))
@@ -0,0 +1,339 @@
+from array import array
+from collections import Counter
+
+# GBA regular background screen entry: PPPP VHTT TTTT TTTT
+TILE_MASK = 0x03FF
+FLIP_H = 0x0400
+FLIP_V = 0x0800
+PALBANK_SHIFT = 12
+
+# Maps are stored in lazily allocated square chunks, one GBA screenblock each
+CHUNK_SIZE = 32
+CHUNK_CELLS = CHUNK_SIZE * CHUNK_SIZE
+_EMPTY_CHUNK = bytes(CHUNK_CELLS * 2)
+
+
+class _AllCells:
+    """Marker passed instead of a cell list when the whole map changed"""
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return "ALL_CELLS"
+
+
+ALL_CELLS = _AllCells()
+
+
+def make_entry(tile_index, flip_h=False, flip_v=False, palbank=0):
+    """Pack a tile index, flip flags and palette bank into a screen entry"""
+    entry = (tile_index & TILE_MASK) | ((palbank & 0xF) << PALBANK_SHIFT)
+    if flip_h:
+        entry |= FLIP_H
+    if flip_v:
+        entry |= FLIP_V
+    return entry
+
+
+def split_entry(entry):
+    """Unpack a screen entry into (tile_index, flip_h, flip_v)"""
+    return (entry & TILE_MASK, bool(entry & FLIP_H), bool(entry & FLIP_V))
+
+
+def entry_palbank(entry):
+    """Palette bank of a screen entry"""
+    return entry >> PALBANK_SHIFT
+
+
+class Tilemap:
+    """Tilemap of u16 GBA screen entries in sparse 32x32 chunks
+
+    Chunks are allocated on the first non-zero entry and freed when they
+    become all zero, so memory follows the painted area. Each chunk counts
+    its cells using a non-zero tile, and tile_chunks counts each tile's
+    cells per chunk, so usage queries and targeted redraws only visit the
+    chunks that can hold a tile.
+    """
+
+    def __init__(self, width=32, height=32):
+        self.width = width
+        self.height = height
+        self.chunks = {}  # (chunk_x, chunk_y) -> array('H') of CHUNK_CELLS entries
+        self.chunk_counts = {}  # (chunk_x, chunk_y) -> [cells with a non-zero tile, non-zero entries]
+        self._tile_chunks = {}  # See tile_chunks; None until rebuilt
+        self.version = 0
+        self.dirty = set()  # Entry offsets (y * width + x) changed since the last take_dirty()
+        self.listeners = []
+
+    def add_listener(self, listener):
+        """Add a listener to be notified of map changes"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Remove a listener from notification list"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(self, cells):
+        """Bump the version and tell listeners which (x, y) cells changed, or ALL_CELLS"""
+        self.version += 1
+        if cells is ALL_CELLS:
+            self.dirty = ALL_CELLS
+        elif self.dirty is not ALL_CELLS:
+            self.dirty.update(y * self.width + x for x, y in cells)
+        for listener in self.listeners:
+            if hasattr(listener, 'on_cells_changed'):
+                listener.on_cells_changed(cells)
+
+    def take_dirty(self):
+        """Return and clear the offsets changed since the last call (ALL_CELLS after a reload)"""
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    @property
+    def tile_chunks(self):
+        """Non-zero tile index -> {(chunk_x, chunk_y): cells in that chunk using it}, built on first use after copy()"""
+        if self._tile_chunks is None:
+            self._tile_chunks = {}
+            for key, chunk in self.chunks.items():
+                self._index_chunk(key, chunk)
+        return self._tile_chunks
+
+    def _store(self, x, y, entry):
+        """Write one entry and maintain chunk and tile counts, returning False if unchanged"""
+        key = (x // CHUNK_SIZE, y // CHUNK_SIZE)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if entry == 0:
+                return False
+            chunk = self.chunks[key] = array('H', _EMPTY_CHUNK)
+            self.chunk_counts[key] = [0, 0]
+        i = (y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE
+        old = chunk[i]
+        if old == entry:
+            return False
+        chunk[i] = entry
+
+        counts = self.chunk_counts[key]
+        old_tile = old & TILE_MASK
+        new_tile = entry & TILE_MASK
+        if old_tile != new_tile:
+            if old_tile:
+                counts[0] -= 1
+                users = self.tile_chunks[old_tile]
+                users[key] -= 1
+                if not users[key]:
+                    del users[key]
+                    if not users:
+                        del self.tile_chunks[old_tile]
+            if new_tile:
+                counts[0] += 1
+                users = self.tile_chunks.setdefault(new_tile, {})
+                users[key] = users.get(key, 0) + 1
+        counts[1] += (entry != 0) - (old != 0)
+        if counts[1] == 0:
+            del self.chunks[key]
+            del self.chunk_counts[key]
+        return True
+
+    def _clear(self):
+        self.chunks = {}
+        self.chunk_counts = {}
+        self._tile_chunks = {}
+
+    def update(self, offsets, entries):
+        """Set several entries by row-major offset with a single notification"""
+        width = self.width
+        for offset, entry in zip(offsets, entries):
+            self._store(offset % width, offset // width, entry)
+        self.notify([(offset % width, offset // width) for offset in offsets])
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get_entry(self, x, y):
+        chunk = self.chunks.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+        if chunk is None:
+            return 0
+        return chunk[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE]
+
+    def set_entry(self, x, y, entry):
+        """Set a raw screen entry, returning True if it changed"""
+        if not self._store(x, y, entry):
+            return False
+        self.notify([(x, y)])
+        return True
+
+    def get(self, x, y):
+        """Return (tile_index, flip_h, flip_v) for a cell"""
+        return split_entry(self.get_entry(x, y))
+
+    def set(self, x, y, tile_index, flip_h=False, flip_v=False, palbank=0):
+        return self.set_entry(x, y, make_entry(tile_index, flip_h, flip_v, palbank))
+
+    def get_row(self, y):
+        """Return one row of screen entries as an array"""
+        row = array('H', bytes(self.width * 2))
+        row_in_chunk = (y % CHUNK_SIZE) * CHUNK_SIZE
+        chunk_y = y // CHUNK_SIZE
+        # One lookup per chunk column, so a row costs the same however many chunks the map has
+        for start in range(0, self.width, CHUNK_SIZE):
+            chunk = self.chunks.get((start // CHUNK_SIZE, chunk_y))
+            if chunk is not None:
+                count = min(CHUNK_SIZE, self.width - start)
+                row[start:start + count] = chunk[row_in_chunk:row_in_chunk + count]
+        return row
+
+    def to_array(self):
+        """Return all entries as one dense row-major array"""
+        entries = array('H')
+        for y in range(self.height):
+            entries.extend(self.get_row(y))
+        return entries
+
+    def iter_used_cells(self):
+        """Yield (x, y, entry) for every non-zero entry, visiting allocated chunks only"""
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            for i, entry in enumerate(chunk):
+                if entry:
+                    yield chunk_x * CHUNK_SIZE + i % CHUNK_SIZE, chunk_y * CHUNK_SIZE + i // CHUNK_SIZE, entry
+
+    def used_tiles(self):
+        """Set of non-zero tile indices placed on the map"""
+        return set(self.tile_chunks)
+
+    def tile_chunk_keys(self, tile_indices):
+        """Set of chunk keys holding any of the non-zero tile_indices"""
+        return {key for tile_index in tile_indices for key in self.tile_chunks.get(tile_index, ())}
+
+    def cells_using(self, tile_indices):
+        """List of (x, y) cells using any of the non-zero tile_indices, scanning only the chunks that hold them"""
+        cells = []
+        for key in self.tile_chunk_keys(tile_indices):
+            base_x, base_y = key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE
+            for i, entry in enumerate(self.chunks[key]):
+                if entry & TILE_MASK in tile_indices:
+                    cells.append((base_x + i % CHUNK_SIZE, base_y + i // CHUNK_SIZE))
+        return cells
+
+    def used_palbanks(self):
+        """Set of palette banks referenced by non-zero entries"""
+        return {entry >> PALBANK_SHIFT for _, _, entry in self.iter_used_cells()}
+
+    def used_bounds(self):
+        """(max_x, max_y) over cells with a non-zero tile, or None if there are none"""
+        used = [key for key, counts in self.chunk_counts.items() if counts[0]]
+        if not used:
+            return None
+
+        # Only the right-most and bottom-most used chunks need scanning
+        max_chunk_x = max(chunk_x for chunk_x, _ in used)
+        max_chunk_y = max(chunk_y for _, chunk_y in used)
+        max_x = max_y = 0
+        for key in used:
+            if key[0] != max_chunk_x and key[1] != max_chunk_y:
+                continue
+            for i, entry in enumerate(self.chunks[key]):
+                if entry & TILE_MASK:
+                    if key[0] == max_chunk_x:
+                        max_x = max(max_x, key[0] * CHUNK_SIZE + i % CHUNK_SIZE)
+                    if key[1] == max_chunk_y:
+                        max_y = max(max_y, key[1] * CHUNK_SIZE + i // CHUNK_SIZE)
+        return max_x, max_y
+
+    def resize(self, width, height):
+        """Change the map dimensions, keeping the overlapping top-left area"""
+        for x, y, _ in list(self.iter_used_cells()):
+            if x >= width or y >= height:
+                self._store(x, y, 0)
+        self.width = width
+        self.height = height
+        self.notify(ALL_CELLS)
+
+    def clamp_tiles(self, tile_count):
+        """Reset cells that reference tiles outside the tileset"""
+        changed = self.cells_using({tile_index for tile_index in self.tile_chunks if tile_index >= tile_count})
+        if not changed:
+            return
+        for x, y in changed:
+            self._store(x, y, 0)
+        self.notify(changed)
+
+    def _index_chunk(self, key, chunk):
+        """Add a chunk's tile users to the index, returning how many of its cells use a non-zero tile"""
+        tiles = Counter(map(TILE_MASK.__and__, chunk))
+        tiles.pop(0, None)
+        for tile_index, count in tiles.items():
+            self._tile_chunks.setdefault(tile_index, {})[key] = count
+        return sum(tiles.values())
+
+    def _load_chunk(self, key, chunk):
+        """Install a whole chunk array into a cleared map, deriving its counts and tile users in one pass"""
+        used = CHUNK_CELLS - chunk.count(0)
+        if used:
+            self.chunks[key] = chunk
+            self.chunk_counts[key] = [self._index_chunk(key, chunk), used]
+
+    def load_chunks(self, chunks):
+        """Replace the map from (chunk_x, chunk_y, entries) tuples"""
+        self._clear()
+        for chunk_x, chunk_y, entries in chunks:
+            key = (chunk_x, chunk_y)
+            x, y = chunk_x * CHUNK_SIZE, chunk_y * CHUNK_SIZE
+            if key in self.chunks or not self.in_bounds(x, y):
+                continue
+            chunk = array('H', entries)
+            # Zero the parts of edge chunks that lie outside the map
+            columns = min(CHUNK_SIZE, self.width - x)
+            if columns < CHUNK_SIZE:
+                for row in range(0, CHUNK_CELLS, CHUNK_SIZE):
+                    chunk[row + columns:row + CHUNK_SIZE] = array('H', bytes((CHUNK_SIZE - columns) * 2))
+            rows = min(CHUNK_SIZE, self.height - y)
+            if rows < CHUNK_SIZE:
+                chunk[rows * CHUNK_SIZE:] = array('H', bytes((CHUNK_SIZE - rows) * CHUNK_SIZE * 2))
+            self._load_chunk(key, chunk)
+        self.notify(ALL_CELLS)
+
+    def load_entries(self, entries, width):
+        """Replace the map from row-major screen entries that are width cells wide"""
+        self._clear()
+        entries = array('H', entries)
+        columns = min(self.width, width)
+        rows = min(self.height, (len(entries) + width - 1) // width)
+        for y in range(0, rows, CHUNK_SIZE):
+            for x in range(0, columns, CHUNK_SIZE):
+                chunk = array('H', _EMPTY_CHUNK)
+                count = min(CHUNK_SIZE, columns - x)
+                for row in range(min(CHUNK_SIZE, rows - y)):
+                    start = (y + row) * width + x
+                    line = entries[start:start + count]
+                    chunk[row * CHUNK_SIZE:row * CHUNK_SIZE + len(line)] = line
+                self._load_chunk((x // CHUNK_SIZE, y // CHUNK_SIZE), chunk)
+        self.notify(ALL_CELLS)
+
+    def load_cells(self, rows):
+        """Replace the map from rows of (tile_index, flip_h, flip_v) tuples, taking their dimensions"""
+        if rows:
+            self.width = max(len(row) for row in rows)
+            self.height = len(rows)
+        self._clear()
+        for y, row in enumerate(rows):
+            for x, (tile_index, flip_h, flip_v) in enumerate(row):
+                if tile_index is None or tile_index < 0:
+                    continue
+                self._store(x, y, make_entry(tile_index, flip_h, flip_v))
+        self.notify(ALL_CELLS)
+
+    def copy(self):
+        """Return a detached copy of the map data, without listeners
+
+        Only the chunks are copied; the copy rebuilds its tile index if it
+        is ever queried, which autosave snapshots never do.
+        """
+        tilemap = Tilemap(self.width, self.height)
+        tilemap.chunks = {key: array('H', chunk) for key, chunk in self.chunks.items()}
+        tilemap.chunk_counts = {key: list(counts) for key, counts in self.chunk_counts.items()}
+        tilemap._tile_chunks = None
+        return tilemap
@@ -0,0 +1,126 @@
+TOTAL_TILES = 512
+TILE_SIZE = 8  # Tile width/height in pixels
+TILE_PIXELS = TILE_SIZE * TILE_SIZE
+TILE_MODES = (4, 8)  # Bits per pixel: 16 colors from a palette bank, or the whole 256-color palette
+
+
+class Tileset:
+    """Tile pixels stored as one contiguous buffer, one palette index per byte
+
+    The buffer layout is the same in 4bpp and 8bpp mode; bpp only sets the
+    range of pixel values and how tiles are packed on export.
+    """
+
+    def __init__(self, tile_count=TOTAL_TILES, bpp=4):
+        self.tile_count = tile_count
+        self.bpp = bpp
+        self.data = bytearray(tile_count * TILE_PIXELS)
+        self.version = 0
+        self.dirty = set()  # Tiles changed since the last take_dirty()
+        self.listeners = []
+
+    def __len__(self):
+        return self.tile_count
+
+    def add_listener(self, listener):
+        """Add a listener to be notified of tile changes"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Remove a listener from notification list"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(self, indices):
+        """Bump the version and tell listeners which tiles changed"""
+        self.version += 1
+        self.dirty.update(indices)
+        for listener in self.listeners:
+            if hasattr(listener, 'on_tiles_changed'):
+                listener.on_tiles_changed(indices)
+
+    @property
+    def tile_bytes(self):
+        """VRAM bytes per tile in the current mode"""
+        return TILE_PIXELS * self.bpp // 8
+
+    def set_bpp(self, bpp):
+        """Switch between 4bpp and 8bpp tiles; 4bpp needs every pixel below 16"""
+        if bpp not in TILE_MODES:
+            raise ValueError("tiles are 4 or 8 bits per pixel, not %r" % (bpp,))
+        if bpp == self.bpp:
+            return
+        if bpp == 4 and max(self.data, default=0) > 15:
+            raise ValueError("tiles use colors past 15, which 4bpp tiles cannot hold")
+        self.bpp = bpp
+        for listener in self.listeners:
+            if hasattr(listener, 'on_bpp_changed'):
+                listener.on_bpp_changed(bpp)
+        # Every tile now renders and exports differently
+        self.notify(range(self.tile_count))
+
+    def take_dirty(self):
+        """Return and clear the set of tiles changed since the last call"""
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    def update(self, indices, pixels):
+        """Replace several tiles from concatenated 64-byte tiles with a single notification"""
+        for n, index in enumerate(indices):
+            start = index * TILE_PIXELS
+            self.data[start:start + TILE_PIXELS] = pixels[n * TILE_PIXELS:(n + 1) * TILE_PIXELS]
+        self.notify(list(indices))
+
+    def tile_view(self, index):
+        """Zero-copy view of one tile's 64 pixels"""
+        start = index * TILE_PIXELS
+        return memoryview(self.data)[start:start + TILE_PIXELS]
+
+    def get_tile(self, index):
+        """Return a copy of one tile's pixels as bytes"""
+        start = index * TILE_PIXELS
+        return bytes(self.data[start:start + TILE_PIXELS])
+
+    def set_tile(self, index, pixels):
+        """Replace one tile's pixels"""
+        start = index * TILE_PIXELS
+        pixels = bytes(pixels)
+        if len(pixels) != TILE_PIXELS:
+            raise ValueError("a tile needs %d pixels, got %d" % (TILE_PIXELS, len(pixels)))
+        if self.data[start:start + TILE_PIXELS] != pixels:
+            self.data[start:start + TILE_PIXELS] = pixels
+            self.notify([index])
+
+    def get_pixel(self, index, pixel):
+        return self.data[index * TILE_PIXELS + pixel]
+
+    def set_pixel(self, index, pixel, value):
+        """Set a single pixel, returning True if it changed"""
+        offset = index * TILE_PIXELS + pixel
+        if self.data[offset] == value:
+            return False
+        self.data[offset] = value
+        self.notify([index])
+        return True
+
+    def is_empty(self, index):
+        start = index * TILE_PIXELS
+        return not any(self.data[start:start + TILE_PIXELS])
+
+    def last_non_empty(self):
+        """Index of the last tile with any non-zero pixel (0 if all empty)"""
+        used = len(self.data.rstrip(b'\x00'))
+        return max(0, (used - 1) // TILE_PIXELS)
+
+    def load_bytes(self, data):
+        """Replace tiles from a byte-per-pixel buffer, zero-filling the rest"""
+        data = bytes(data[:len(self.data)])
+        self.data[:len(data)] = data
+        self.data[len(data):] = bytes(len(self.data) - len(data))
+        self.notify(range(self.tile_count))
+
+    def load_lists(self, tiles):
+        """Replace tiles from a list of 64-pixel lists"""
+        self.load_bytes(b''.join(bytes(tile[:TILE_PIXELS]).ljust(TILE_PIXELS, b'\x00')
+                                 for tile in tiles))
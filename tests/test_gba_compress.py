@@ -0,0 +1,53 @@
+"""Round trips through every GBA compression codec
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formats.gba_compress import CODECS, compress, compress_smallest, decompress, stream_codec  # noqa: E402
+
+_random = random.Random(0)
+
+SAMPLES = {
+    "empty": b"",
+    "one byte": b"\x7f",
+    "two bytes": b"\x01\x02",
+    "three bytes": b"abc",
+    "long run": b"\x00" * 5000,
+    "runs": b"".join(bytes([value]) * length for value, length in [(1, 200), (2, 3), (3, 1), (1, 131), (4, 2)]),
+    "no matches": bytes(range(256)),
+    "noise": bytes(_random.randrange(256) for _ in range(3001)),
+    "repeated pattern": b"tile" * 997 + b"end",
+    "nibbles": bytes(_random.choice((0x00, 0x11, 0x12, 0x21)) for _ in range(1023)),
+}
+
+
+@pytest.mark.parametrize("codec", CODECS)
+@pytest.mark.parametrize("name", SAMPLES)
+def test_round_trip(codec, name):
+    data = SAMPLES[name]
+    stream = compress(data, codec)
+    assert len(stream) % 4 == 0
+    assert stream_codec(stream) == codec
+    assert decompress(stream) == data
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_smallest_round_trip(name):
+    data = SAMPLES[name]
+    codec, stream = compress_smallest(data)
+    assert stream == compress(data, codec)
+    assert all(len(stream) <= len(compress(data, other)) for other in CODECS)
+    assert decompress(stream) == data
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        compress(b"data", "zip")
@@ -3,7 +3,7 @@ from tkinter import ttk
 from ui.tilepaint_pane import TilePainterPane
 
 class EditorPane(tk.Frame):
-    def __init__(self, master):
+    def __init__(self, master, tileset, updates=None):
         super().__init__(master)
 
         self.label = tk.Label(self, text="Tilemap", font=("Arial", 12, "bold"))
@@ -26,6 +26,6 @@ class EditorPane(tk.Frame):
 
         
         tk.Label(self.pixel_art_tab, text="Pixel Art View").pack(pady=20)
-        self.tile_painter = TilePainterPane(self.pixel_art_tab)
+        self.tile_painter = TilePainterPane(self.pixel_art_tab, tileset, updates)
         self.tile_painter.pack(fill='both', expand=True, pady=10) 
 
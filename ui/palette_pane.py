@@ -1,21 +1,33 @@
 import tkinter as tk
 from tkinter import colorchooser
 
+from model.palette import BANK_COUNT, rgb_to_gba
+
 class PalettePane(tk.Frame):
     PALETTE_SIZE = 16  # Standard 16-color palette
     BOX_SIZE = 20      # Size of each color box
     BORDER_WIDTH = 2   # Width of selection border
 
-    def __init__(self, master, title="Palette"):
+    def __init__(self, master, palette, title="Palette"):
         super().__init__(master)
         self.color_boxes = []
-        self.palette = [(0, 0, 0)] * self.PALETTE_SIZE  # Initialize with black
+        self.model = palette  # Shared model.palette.Palette
         self.active_index = 0
+        self.bank = 0  # Palette bank shown and used for painting and placing tiles
+        self.bpp = 4  # 8bpp tiles paint with palette RAM indices and ignore banks
         self.listeners = []
+        self.model.add_listener(self)
 
         # Add title label
         self.title_label = tk.Label(self, text=title, font=("Arial", 10, "bold"))
-        self.title_label.grid(row=0, column=0, columnspan=self.PALETTE_SIZE, pady=(0, 5))
+        self.title_label.grid(row=0, column=0, columnspan=self.PALETTE_SIZE - 4, pady=(0, 5))
+
+        # Palette bank selector
+        self.bank_label = tk.Label(self, text="Bank")
+        self.bank_label.grid(row=0, column=self.PALETTE_SIZE - 4, columnspan=2, pady=(0, 5))
+        self.bank_var = tk.StringVar(value="0")
+        tk.Spinbox(self, from_=0, to=BANK_COUNT - 1, width=3, textvariable=self.bank_var,
+                   command=self.on_bank_changed).grid(row=0, column=self.PALETTE_SIZE - 2, columnspan=2, pady=(0, 5))
 
         # Create color boxes
         for i in range(self.PALETTE_SIZE):
@@ -42,6 +54,31 @@ class PalettePane(tk.Frame):
         self.set_active_color(0)
         self.update_all_colors()
 
+    @property
+    def palette(self):
+        """Colors pixel values map to, as 8-bit (r, g, b) tuples: the current bank, or all 256 in 8bpp"""
+        if self.bpp == 8:
+            return self.model.to_rgb_list()
+        return self.model.bank_rgb_list(self.bank)
+
+    def model_index(self, index):
+        """Palette RAM index of a box in the current bank"""
+        return self.bank * self.PALETTE_SIZE + index
+
+    def pixel_value(self, index):
+        """Pixel value that paints with a box of the current bank"""
+        return self.model_index(index) if self.bpp == 8 else index
+
+    def set_bpp(self, bpp):
+        """Follow the project's tile mode; in 8bpp the bank selector picks a row of the 256 colors"""
+        if bpp == self.bpp:
+            return
+        self.bpp = bpp
+        self.bank_label.config(text="Row" if bpp == 8 else "Bank")
+        self.notify_palette_changed()
+        self.notify_active_color_changed()
+        self.notify_bank_changed()
+
     def add_listener(self, listener):
         """Add a listener to be notified of palette changes"""
         if listener not in self.listeners:
@@ -56,15 +93,42 @@ class PalettePane(tk.Frame):
         """Notify all listeners about active color change"""
         for listener in self.listeners:
             if hasattr(listener, 'set_active_color_index'):
-                listener.set_active_color_index(self.active_index)
+                listener.set_active_color_index(self.pixel_value(self.active_index))
 
     def notify_palette_changed(self):
         """Notify all listeners about palette change"""
+        palette = self.palette
         for listener in self.listeners:
             if hasattr(listener, 'set_palette'):
-                listener.set_palette(self.palette)
+                listener.set_palette(palette)
             elif hasattr(listener, 'on_palette_changed'):
-                listener.on_palette_changed(self.palette)
+                listener.on_palette_changed(palette)
+
+    def notify_bank_changed(self):
+        """Notify all listeners about the selected palette bank"""
+        bank = self.bank if self.bpp == 4 else 0  # 8bpp tiles ignore the bank bits
+        for listener in self.listeners:
+            if hasattr(listener, 'set_palette_bank'):
+                listener.set_palette_bank(bank)
+
+    def on_bank_changed(self):
+        """Show and use another palette bank"""
+        try:
+            bank = int(self.bank_var.get())
+        except ValueError:
+            return
+        self.set_bank(bank)
+
+    def set_bank(self, bank):
+        if 0 <= bank < BANK_COUNT and bank != self.bank:
+            self.bank = bank
+            self.bank_var.set(str(bank))
+            self.update_all_colors()
+            if self.bpp == 8:
+                self.notify_active_color_changed()  # Same colors, another row of them
+            else:
+                self.notify_palette_changed()
+                self.notify_bank_changed()
 
     def set_active_color(self, index):
         """Set the currently active color and update UI"""
@@ -80,7 +144,7 @@ class PalettePane(tk.Frame):
 
     def open_color_picker(self, index):
         """Open color picker dialog for the specified color index"""
-        current_color = self.rgb_to_hex(self.palette[index])
+        current_color = self.rgb_to_hex(self.model.get_rgb(self.model_index(index)))
         result = colorchooser.askcolor(
             initialcolor=current_color,
             title=f"Select Color {index}",
@@ -91,25 +155,29 @@ class PalettePane(tk.Frame):
             self.set_color(index, result[0])
 
     def set_color(self, index, rgb_tuple):
-        """Set color at specified index and notify listeners"""
+        """Set color at specified index (stored as 15-bit GBA color)"""
         if 0 <= index < self.PALETTE_SIZE:
-            # Convert to 5-bit GBA color if needed (or keep 8-bit)
-            r, g, b = map(int, rgb_tuple)
-            self.palette[index] = (r, g, b)
-            self.update_color_box(index)
-            self.notify_palette_changed()
+            self.model.set_rgb(self.model_index(index), rgb_tuple)
 
     def set_palette(self, new_palette):
-        """Set the entire palette at once"""
+        """Set all colors of the current bank at once"""
         if len(new_palette) == self.PALETTE_SIZE:
-            self.palette = [tuple(color) for color in new_palette]
-            self.update_all_colors()
+            self.model.update(range(self.model_index(0), self.model_index(self.PALETTE_SIZE)),
+                              [rgb_to_gba(*map(int, c)) for c in new_palette])
+
+    def on_palette_entries_changed(self, indices):
+        """Refresh boxes and notify listeners when colors of the current bank change"""
+        first = self.model_index(0)
+        in_bank = [index - first for index in indices if first <= index < first + self.PALETTE_SIZE]
+        for index in in_bank:
+            self.update_color_box(index)
+        if in_bank or (self.bpp == 8 and indices):
             self.notify_palette_changed()
 
     def update_color_box(self, index):
         """Update visual representation of a single color box"""
         if 0 <= index < self.PALETTE_SIZE:
-            color = self.rgb_to_hex(self.palette[index])
+            color = self.rgb_to_hex(self.model.get_rgb(self.model_index(index)))
             self.color_boxes[index].config(bg=color)
 
     def update_all_colors(self):
@@ -128,4 +196,4 @@ class PalettePane(tk.Frame):
 
     def get_active_color_rgb(self):
         """Get RGB tuple of the active color"""
-        return self.palette[self.active_index]
\ No newline at end of file
+        return self.model.get_rgb(self.model_index(self.active_index))
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+
+
+class RenderCache:
+    """LRU cache of rendered tile images with a memory budget, shared between panes
+
+    Entries are stored under (tile_index, key), where key is whatever else
+    the caller's image depends on (flips, scale, palette). Images of one
+    tile can be evicted together when that tile's pixels change.
+    """
+
+    BYTES_PER_PIXEL = 4  # Tk photo images are stored as RGBA
+
+    def __init__(self, budget_bytes=32 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()  # (tile_index, key) -> (image, size in bytes)
+        self._by_tile = {}  # tile_index -> set of keys
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, tile_index, key):
+        """Return the cached image or None, marking it most recently used"""
+        entry = self._entries.get((tile_index, key))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end((tile_index, key))
+        return entry[0]
+
+    def put(self, tile_index, key, img):
+        """Store an image, evicting least recently used ones beyond the budget"""
+        self._remove((tile_index, key))
+        size = img.width() * img.height() * self.BYTES_PER_PIXEL
+        self._entries[(tile_index, key)] = (img, size)
+        self._by_tile.setdefault(tile_index, set()).add(key)
+        self.bytes += size
+
+        while self.bytes > self.budget_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, full_key):
+        entry = self._entries.pop(full_key, None)
+        if entry is None:
+            return
+        self.bytes -= entry[1]
+        tile_index, key = full_key
+        keys = self._by_tile[tile_index]
+        keys.discard(key)
+        if not keys:
+            del self._by_tile[tile_index]
+
+    def evict_tile(self, tile_index):
+        """Drop every cached image of one tile"""
+        for key in list(self._by_tile.get(tile_index, ())):
+            self._remove((tile_index, key))
+
+    def clear(self):
+        self._entries.clear()
+        self._by_tile.clear()
+        self.bytes = 0
+
+    def stats(self):
+        """Return hit, miss, eviction and size counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
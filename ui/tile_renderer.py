@@ -0,0 +1,31 @@
+import tkinter as tk
+
+FALLBACK_COLOR = "#ff00ff"  # Magenta for indices outside the palette
+
+
+def hex_colors(palette_colors, count=256):
+    """Return "#rrggbb" strings for every possible pixel value of a palette"""
+    colors = [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in palette_colors]
+    return colors + [FALLBACK_COLOR] * (count - len(colors))
+
+
+def tile_row_data(pixels, colors, size=8, flip_h=False, flip_v=False):
+    """Format a tile's pixels as Tk photo row data: "{#rrggbb ...} {...}" """
+    rows = []
+    for y in range(size):
+        row = [colors[p] for p in pixels[y * size:(y + 1) * size]]
+        if flip_h:
+            row.reverse()
+        rows.append("{" + " ".join(row) + "}")
+    if flip_v:
+        rows.reverse()
+    return " ".join(rows)
+
+
+def render_tile(pixels, colors, scale, size=8, flip_h=False, flip_v=False):
+    """Render a tile to a PhotoImage with one put for all pixels and a C-side zoom"""
+    img = tk.PhotoImage(width=size, height=size)
+    img.put(tile_row_data(pixels, colors, size, flip_h, flip_v))
+    if scale == 1:
+        return img
+    return img.zoom(scale)
@@ -1,26 +1,49 @@
 import tkinter as tk
 from tkinter import Scrollbar, Canvas
 
+from model.tilemap import ALL_CELLS, CHUNK_CELLS, FLIP_H, FLIP_V, entry_palbank, split_entry
+from ui.render_cache import RenderCache
+from ui.tile_renderer import hex_colors, render_tile
+
 class TilemapPane(tk.Frame):
-    def __init__(self, master, tile_data_source, palette_source, tile_size=8):
+    MAX_MAP_SIZE = 1024  # Cells per side
+    VIEW_MARGIN = 2  # Cells realized beyond the visible area
+
+    def __init__(self, master, tilemap, tileset, palette, tile_data_source, tile_size=8, render_cache=None,
+                 updates=None):
         super().__init__(master)
-        self.tile_data_source = tile_data_source
-        self.palette_source = palette_source
+        self.tile_data_source = tile_data_source  # Provides active_tile_index
+
+        # Shared models, observed for changes directly or through an UpdateScheduler
+        self.tilemap = tilemap
+        self.tileset = tileset
+        self.palette = palette
+        for model in (tilemap, tileset, palette):
+            (updates or model).add_listener(self)
 
-        self.tile_map_width = 32
-        self.tile_map_height = 32
         self.tile_size = tile_size
         self.scale = 4
 
         self.flip_h = False
         self.flip_v = False
 
-        self.tile_map = [[(0, False, False) for _ in range(self.tile_map_width)] for _ in range(self.tile_map_height)]
+        # Map size controls
+        toolbar = tk.Frame(self)
+        toolbar.pack(side='top', fill='x')
+        tk.Label(toolbar, text="Map size:").pack(side='left')
+        self.width_var = tk.StringVar(value=str(self.tilemap.width))
+        self.height_var = tk.StringVar(value=str(self.tilemap.height))
+        tk.Spinbox(toolbar, from_=1, to=self.MAX_MAP_SIZE, increment=32, width=5,
+                   textvariable=self.width_var).pack(side='left')
+        tk.Label(toolbar, text="x").pack(side='left')
+        tk.Spinbox(toolbar, from_=1, to=self.MAX_MAP_SIZE, increment=32, width=5,
+                   textvariable=self.height_var).pack(side='left')
+        tk.Button(toolbar, text="Resize", command=self.on_resize_map).pack(side='left', padx=4)
 
         self.canvas = tk.Canvas(self, bg='white')
         self.h_scrollbar = tk.Scrollbar(self, orient='horizontal', command=self.canvas.xview)
         self.v_scrollbar = tk.Scrollbar(self, orient='vertical', command=self.canvas.yview)
-        self.canvas.configure(xscrollcommand=self.h_scrollbar.set, yscrollcommand=self.v_scrollbar.set)
+        self.canvas.configure(xscrollcommand=self.on_xscroll, yscrollcommand=self.on_yscroll)
 
         self.h_scrollbar.pack(side='bottom', fill='x')
         self.v_scrollbar.pack(side='right', fill='y')
@@ -32,6 +55,7 @@ class TilemapPane(tk.Frame):
         self.canvas.bind("<Motion>", self.on_mouse_move)
         self.canvas.bind("<Enter>", lambda e: self.canvas.focus_set())  # Focus on mouse enter
         self.canvas.bind("<Control-MouseWheel>", self.on_zoom)
+        self.canvas.bind("<Configure>", lambda e: self.update_viewport())
         
         # Bind key events to the canvas
         self.canvas.bind("<Key>", self.on_keypress)
@@ -39,9 +63,15 @@ class TilemapPane(tk.Frame):
         
         # Store the current palette version for cache invalidation
         self.current_palette_version = 0
+        self._bank_colors = {}  # Palette bank (None for 8bpp) -> "#rrggbb" per pixel value, rebuilt on palette change
+        self.palbank = 0  # Palette bank given to placed tiles
 
-        self.tile_image_cache = {}
-        self._image_refs = []
+        # Bounded LRU cache, possibly shared with other panes; keeps several zoom levels warm
+        self.render_cache = render_cache if render_cache is not None else RenderCache()
+        self.cell_items = {}  # Map offset -> canvas image item, only for cells in the viewport
+        self._image_refs = {}  # Map offset -> PhotoImage shown by its item
+        self.grid_items = []  # Recycled grid line items
+        self._view = None  # (x0, y0, x1, y1) cell range currently realized
 
         self.hover_x = -1
         self.hover_y = -1
@@ -49,81 +79,145 @@ class TilemapPane(tk.Frame):
         self.fill_empty_tiles()
         self.draw_map()
 
-    def render_tile_image(self, tile_index, flip_h, flip_v):
+    def render_entry(self, entry):
+        """Image for a screen entry: its tile, flips and palette bank"""
+        palbank = None if self.tileset.bpp == 8 else entry_palbank(entry)
+        return self.render_tile_image(*split_entry(entry), palbank)
+
+    def render_tile_image(self, tile_index, flip_h, flip_v, palbank=0):
         """Render a tile image with current palette, using versioned cache key"""
-        # Include palette version in cache key
-        key = (tile_index, flip_h, flip_v, self.scale, self.current_palette_version)
+        # Variants are grouped per tile so a tile edit evicts exactly its own images
+        key = ("map", flip_h, flip_v, palbank, self.scale, self.current_palette_version)
         
-        if key in self.tile_image_cache:
-            return self.tile_image_cache[key]
+        img = self.render_cache.get(tile_index, key)
+        if img is not None:
+            return img
 
-        try:
-            tile = self.tile_data_source.tiles_data[tile_index]
-        except (IndexError, AttributeError):
-            tile = [0] * (self.tile_size * self.tile_size)
-
-        size = self.tile_size
-        scaled_size = size * self.scale
-        img = tk.PhotoImage(width=scaled_size, height=scaled_size)
-
-        for i, color_index in enumerate(tile):
-            px = i % size
-            py = i // size
-            if flip_h:
-                px = size - 1 - px
-            if flip_v:
-                py = size - 1 - py
-            try:
-                color = self.palette_source.palette[color_index]
-            except (IndexError, AttributeError):
-                color = (255, 0, 255)  # Fallback color (magenta)
-            hex_color = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
-            img.put(hex_color, to=(px * self.scale, py * self.scale, 
-                                  (px + 1) * self.scale, (py + 1) * self.scale))
-
-        self.tile_image_cache[key] = img
+        if tile_index < len(self.tileset):
+            tile = self.tileset.tile_view(tile_index)
+        else:
+            tile = bytes(self.tile_size * self.tile_size)
+        colors = self._bank_colors.get(palbank)
+        if colors is None:
+            # palbank None: 8bpp pixels index the whole palette
+            rgb = self.palette.to_rgb_list() if palbank is None else self.palette.bank_rgb_list(palbank)
+            colors = self._bank_colors[palbank] = hex_colors(rgb)
+
+        img = render_tile(tile, colors, self.scale, self.tile_size, flip_h, flip_v)
+
+        self.render_cache.put(tile_index, key, img)
         return img
     
     def draw_map(self):
+        """Recreate the visible cell items and the grid (after zoom, palette or map size changes)"""
         self.canvas.delete("all")
-        self._image_refs = []
+        self.cell_items = {}
+        self._image_refs = {}
+        self.grid_items = []
+        self._view = None
+
         size = self.tile_size * self.scale
+        width = self.tilemap.width * size
+        height = self.tilemap.height * size
+        self.canvas.config(scrollregion=(0, 0, width, height))
+        self.update_viewport()
 
-        for y in range(self.tile_map_height):
-            for x in range(self.tile_map_width):
-                tile_index, flip_h, flip_v = self.tile_map[y][x]
-                img = self.render_tile_image(tile_index, flip_h, flip_v)
-                self.canvas.create_image(x * size, y * size, image=img, anchor='nw')
-                self._image_refs.append(img)
+    def visible_range(self):
+        """Cell range (x0, y0, x1, y1) covering the visible canvas area plus a margin"""
+        size = self.tile_size * self.scale
+        left = int(self.canvas.canvasx(0)) // size
+        top = int(self.canvas.canvasy(0)) // size
+        right = int(self.canvas.canvasx(self.canvas.winfo_width())) // size + 1
+        bottom = int(self.canvas.canvasy(self.canvas.winfo_height())) // size + 1
+        return (max(0, left - self.VIEW_MARGIN),
+                max(0, top - self.VIEW_MARGIN),
+                min(self.tilemap.width, right + self.VIEW_MARGIN),
+                min(self.tilemap.height, bottom + self.VIEW_MARGIN))
 
-        width = self.tile_map_width * size
-        height = self.tile_map_height * size
+    def update_viewport(self):
+        """Realize items for cells entering the view, recycling those of cells that left it"""
+        view = self.visible_range()
+        if view == self._view:
+            return
+        self._view = view
+        x0, y0, x1, y1 = view
+        size = self.tile_size * self.scale
+        width = self.tilemap.width
 
-        for x in range(self.tile_map_width + 1):
-            self.canvas.create_line(x * size, 0, x * size, height, fill='red')
-        for y in range(self.tile_map_height + 1):
-            self.canvas.create_line(0, y * size, width, y * size, fill='red')
+        wanted = {y * width + x for y in range(y0, y1) for x in range(x0, x1)}
+        stale = [offset for offset in self.cell_items if offset not in wanted]
+        for offset in stale:
+            self._image_refs.pop(offset, None)
+        stale_items = [self.cell_items.pop(offset) for offset in stale]
 
-        self.canvas.config(scrollregion=(0, 0, width, height))
+        for offset in wanted:
+            if offset in self.cell_items:
+                continue
+            x, y = offset % width, offset // width
+            img = self.render_entry(self.tilemap.get_entry(x, y))
+            if stale_items:
+                item = stale_items.pop()
+                self.canvas.coords(item, x * size, y * size)
+                self.canvas.itemconfig(item, image=img)
+            else:
+                item = self.canvas.create_image(x * size, y * size, image=img, anchor='nw')
+            self.cell_items[offset] = item
+            self._image_refs[offset] = img
+        for item in stale_items:
+            self.canvas.delete(item)
+
+        self.update_grid(view)
+
+    def update_grid(self, view):
+        """Reposition grid lines so they only cover the realized cells"""
+        x0, y0, x1, y1 = view
+        size = self.tile_size * self.scale
+        lines = [(x * size, y0 * size, x * size, y1 * size) for x in range(x0, x1 + 1)]
+        lines += [(x0 * size, y * size, x1 * size, y * size) for y in range(y0, y1 + 1)]
+
+        while len(self.grid_items) < len(lines):
+            self.grid_items.append(self.canvas.create_line(0, 0, 0, 0, fill='red', tags='grid'))
+        while len(self.grid_items) > len(lines):
+            self.canvas.delete(self.grid_items.pop())
+        for item, coords in zip(self.grid_items, lines):
+            self.canvas.coords(item, *coords)
+        self.canvas.tag_raise('grid')
+
+    def on_xscroll(self, first, last):
+        self.h_scrollbar.set(first, last)
+        self.update_viewport()
+
+    def on_yscroll(self, first, last):
+        self.v_scrollbar.set(first, last)
+        self.update_viewport()
+
+    def on_resize_map(self):
+        """Apply the map size entered in the toolbar"""
+        try:
+            width = int(self.width_var.get())
+            height = int(self.height_var.get())
+        except ValueError:
+            return
+        width = max(1, min(width, self.MAX_MAP_SIZE))
+        height = max(1, min(height, self.MAX_MAP_SIZE))
+        if (width, height) != (self.tilemap.width, self.tilemap.height):
+            self.tilemap.resize(width, height)
 
     def place_tile(self, event):
         grid_size = self.tile_size * self.scale
         x = int(self.canvas.canvasx(event.x) // grid_size)
         y = int(self.canvas.canvasy(event.y) // grid_size)
 
-        if 0 <= x < self.tile_map_width and 0 <= y < self.tile_map_height:
+        if self.tilemap.in_bounds(x, y):
             tile_index = self.tile_data_source.active_tile_index
-            h_flip = self.flip_h
-            v_flip = self.flip_v
-            self.tile_map[y][x] = (tile_index, h_flip, v_flip)
-            self.draw_map()
+            self.tilemap.set(x, y, tile_index, self.flip_h, self.flip_v, self.palbank)
 
     def on_mouse_move(self, event):
         grid_size = self.tile_size * self.scale
         x = int(self.canvas.canvasx(event.x) // grid_size)
         y = int(self.canvas.canvasy(event.y) // grid_size)
         
-        if 0 <= x < self.tile_map_width and 0 <= y < self.tile_map_height:
+        if self.tilemap.in_bounds(x, y):
             self.hover_x = x
             self.hover_y = y
             # Set focus when mouse moves over canvas to ensure key presses work
@@ -131,25 +225,21 @@ class TilemapPane(tk.Frame):
 
     def on_keypress(self, event):
         # Only process if we have a valid hover position
-        if not (0 <= self.hover_x < self.tile_map_width and 
-                0 <= self.hover_y < self.tile_map_height):
+        if not self.tilemap.in_bounds(self.hover_x, self.hover_y):
             return
 
-        tile_index, flip_h, flip_v = self.tile_map[self.hover_y][self.hover_x]
+        entry = self.tilemap.get_entry(self.hover_x, self.hover_y)
+        tile_index, flip_h, flip_v = split_entry(entry)
         
+        # Flips keep the cell's palette bank
         if event.keysym.lower() == 'h':
-            flip_h = not flip_h
-            self.tile_map[self.hover_y][self.hover_x] = (tile_index, flip_h, flip_v)
-            self.draw_map()
+            self.tilemap.set_entry(self.hover_x, self.hover_y, entry ^ FLIP_H)
         elif event.keysym.lower() == 'v':
-            flip_v = not flip_v
-            self.tile_map[self.hover_y][self.hover_x] = (tile_index, flip_h, flip_v)
-            self.draw_map()
+            self.tilemap.set_entry(self.hover_x, self.hover_y, entry ^ FLIP_V)
         elif event.keysym.lower() == 'space':
             # Bonus: Space to place current tile with current flip settings
             tile_index = self.tile_data_source.active_tile_index
-            self.tile_map[self.hover_y][self.hover_x] = (tile_index, flip_h, flip_v)
-            self.draw_map()
+            self.tilemap.set(self.hover_x, self.hover_y, tile_index, flip_h, flip_v, self.palbank)
 
 
     def on_zoom(self, event):
@@ -157,64 +247,61 @@ class TilemapPane(tk.Frame):
             self.scale = min(self.scale + 1, 8)
         else:
             self.scale = max(self.scale - 1, 1)
-        self.tile_image_cache.clear()
+        # Scale is part of the cache key, so other zoom levels stay cached
         self.draw_map()
 
     def fill_empty_tiles(self):
-        for y in range(self.tile_map_height):
-            for x in range(self.tile_map_width):
-                tile_index, flip_h, flip_v = self.tile_map[y][x]
-                if (tile_index is None or 
-                    tile_index < 0 or 
-                    not hasattr(self.tile_data_source, 'tiles_data') or
-                    tile_index >= len(self.tile_data_source.tiles_data)):
-                    self.tile_map[y][x] = (0, False, False)
+        self.tilemap.clamp_tiles(len(self.tileset))
+
+    def set_palette_bank(self, palbank):
+        """Use another palette bank for placed tiles (called by the palette pane)"""
+        self.palbank = palbank
 
     def set_active_tile(self, tile_index):
         self.tile_data_source.active_tile_index = tile_index
 
-    def update_tile_data(self, tile_data):
-        """Update the tileset and refresh all tiles that use the updated tiles"""
-        old_tile_data = self.tile_data_source
-        self.tile_data_source = tile_data
-        
-        # If the number of tiles changed, validate all tile indices
-        if (hasattr(old_tile_data, 'tiles_data') and 
-            hasattr(tile_data, 'tiles_data') and 
-            len(old_tile_data.tiles_data) != len(tile_data.tiles_data)):
-            self.fill_empty_tiles()
-        
-        # Clear the entire cache as tile data may have changed
-        self.tile_image_cache.clear()
-        self.draw_map()
+    def redraw_cells(self, cells):
+        """Swap the image of existing cell items without touching the rest of the canvas"""
+        for x, y in cells:
+            offset = y * self.tilemap.width + x
+            item = self.cell_items.get(offset)
+            if item is None:
+                continue  # Outside the viewport, rendered when scrolled into view
+            img = self.render_entry(self.tilemap.get_entry(x, y))
+            if self._image_refs.get(offset) is not img:
+                self.canvas.itemconfig(item, image=img)
+                self._image_refs[offset] = img
+
+    def on_cells_changed(self, cells):
+        """Redraw only the cells that changed in the tilemap model"""
+        if cells is ALL_CELLS:
+            # Whole map reloaded, possibly resized
+            self.width_var.set(str(self.tilemap.width))
+            self.height_var.set(str(self.tilemap.height))
+            self.draw_map()
+        else:
+            self.redraw_cells(cells)
 
-    def update_palette(self, palette):
-        """Update the palette and refresh all tiles to reflect color changes"""
-        self.palette_source = palette
+    def on_tiles_changed(self, indices):
+        """Refresh cached images when the tileset model changes, redrawing the affected cells in one pass"""
+        for tile_index in indices:
+            self.render_cache.evict_tile(tile_index)
+        self.redraw_cells(self._cells_using(set(indices)))
+
+    def on_palette_entries_changed(self, indices):
+        """Refresh all tiles to reflect color changes"""
+        # Old versions can never hit again and age out of the LRU
         self.current_palette_version += 1  # Increment version to invalidate cache
-        
-        # Clear the entire image cache as all colors may have changed
-        self.tile_image_cache.clear()
+        self._bank_colors = {}
         
         # Redraw the entire map with new colors
         self.draw_map()
 
-    def notify_tile_update(self, tile_index):
-        """Update specific tile in the cache and redraw affected tiles"""
-        # Remove all cached variants of this tile index
-        keys_to_remove = [k for k in self.tile_image_cache if k[0] == tile_index]
-        for k in keys_to_remove:
-            del self.tile_image_cache[k]
-        
-        # Redraw all tiles that use this tile index
-        need_redraw = False
-        for y in range(self.tile_map_height):
-            for x in range(self.tile_map_width):
-                if self.tile_map[y][x][0] == tile_index:
-                    need_redraw = True
-                    break
-            if need_redraw:
-                break
-        
-        if need_redraw:
-            self.draw_map()
\ No newline at end of file
+    def _cells_using(self, tile_indices):
+        """Cells showing any of tile_indices, scanning the chunks holding them or the visible cells, whichever is smaller"""
+        if (0 not in tile_indices
+                and len(self.tilemap.tile_chunk_keys(tile_indices)) * CHUNK_CELLS <= len(self.cell_items)):
+            return self.tilemap.cells_using(tile_indices)
+        width = self.tilemap.width
+        return [(offset % width, offset // width) for offset in self.cell_items
+                if self.tilemap.get(offset % width, offset // width)[0] in tile_indices]
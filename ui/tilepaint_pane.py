@@ -1,11 +1,12 @@
 import tkinter as tk
 
+from ui.tile_renderer import hex_colors
+
 class TilePainterPane(tk.Frame):
-    def __init__(self, master, on_tile_updated=None):
+    def __init__(self, master, tileset, updates=None):
         super().__init__(master)
-        self.on_tile_updated = on_tile_updated
-        self.tile_pixels = [0] * 64
-        self.history = []  # Undo history stack
+        self.tileset = tileset  # Shared model.tileset.Tileset, painted in place
+        (updates or tileset).add_listener(self)  # Optionally coalesced by an UpdateScheduler
 
         self.rows = 8
         self.cols = 8
@@ -13,7 +14,10 @@ class TilePainterPane(tk.Frame):
         self.offset_x = 0
         self.offset_y = 0
         self.palette_colors = [(255, 255, 255)] * 16
+        self._hex_colors = hex_colors(self.palette_colors)
         self.active_color_index = 1
+        self.cell_items = []  # (rectangle, text) per pixel, created once and reconfigured
+        self._shown = []  # Pixel value each cell currently displays, None to force a refresh
 
         self.canvas = tk.Canvas(self, bg="white", highlightthickness=0)
         self.canvas.pack(fill='both', expand=True)
@@ -23,43 +27,33 @@ class TilePainterPane(tk.Frame):
         self.canvas.bind("<B1-Motion>", self.on_drag)
         self.canvas.bind("<ButtonRelease-1>", self.on_release)
 
-        self.bind_all("<Control-z>", self.undo)  # Bind Ctrl+Z
-
         self.current_tile_index = 0
         self.mouse_down = False
         self.last_painted = set()  # Prevent repainting same cell during drag
 
-    def load_tile(self, pixels, tile_index=None):
-        self.tile_pixels = pixels.copy()
-        if tile_index is not None:
-            self.current_tile_index = tile_index
-        self.redraw_grid()
-
-    def set_on_tile_updated(self, callback):
-        self.on_tile_updated = callback
+    @property
+    def tile_pixels(self):
+        """Zero-copy view of the pixels of the tile being edited"""
+        return self.tileset.tile_view(self.current_tile_index)
 
-    def push_undo(self):
-        self.history.append(self.tile_pixels.copy())
-        if len(self.history) > 50:  # Limit history size
-            self.history.pop(0)
+    def load_tile(self, tile_index):
+        self.current_tile_index = tile_index
+        self.refresh_cells()
 
-    def undo(self, event=None):
-        if self.history:
-            self.tile_pixels = self.history.pop()
-            self.redraw_grid()
-            if self.on_tile_updated:
-                self.on_tile_updated(self.tile_pixels)
+    def on_tiles_changed(self, indices):
+        """Refresh the cells that changed when the tile being edited changes in the model"""
+        if self.current_tile_index in indices:
+            self.refresh_cells()
 
     def paint_pixel(self, x, y):
         idx = y * 8 + x
-        if self.tile_pixels[idx] != self.active_color_index:
-            self.tile_pixels[idx] = self.active_color_index
-            return True
-        return False
+        return self.tileset.set_pixel(self.current_tile_index, idx, self.active_color_index)
 
     def set_palette(self, colors):
         self.palette_colors = colors
-        self.redraw_grid()
+        self._hex_colors = hex_colors(colors)
+        self._shown = [None] * len(self._shown)  # Every fill and label color may have changed
+        self.refresh_cells()
 
     def set_active_color_index(self, index):
         self.active_color_index = index
@@ -67,7 +61,6 @@ class TilePainterPane(tk.Frame):
     def on_click(self, event):
         x, y = self.event_to_coords(event)
         if 0 <= x < self.cols and 0 <= y < self.rows:
-            self.push_undo()
             self.last_painted.clear()
             self.paint_and_update(x, y)
 
@@ -82,11 +75,8 @@ class TilePainterPane(tk.Frame):
         self.last_painted.clear()
 
     def paint_and_update(self, x, y):
-        changed = self.paint_pixel(x, y)
-        if changed:
-            self.redraw_grid()
-            if self.on_tile_updated:
-                self.on_tile_updated(self.tile_pixels)
+        # The tileset notifies every observer, including this pane
+        self.paint_pixel(x, y)
 
     def event_to_coords(self, event):
         x = (event.x - self.offset_x) // self.cell_size
@@ -99,38 +89,46 @@ class TilePainterPane(tk.Frame):
         return 'black' if luminance > 0.5 else 'white'
 
     def redraw_grid(self, event=None):
-        self.canvas.delete("all")
+        """Lay out the grid for the current canvas size, creating its items on first use"""
         width = self.canvas.winfo_width()
         height = self.canvas.winfo_height()
         self.cell_size = min(width // self.cols, height // self.rows)
         self.offset_x = (width - (self.cell_size * self.cols)) // 2
         self.offset_y = (height - (self.cell_size * self.rows)) // 2
 
-        for y in range(self.rows):
-            for x in range(self.cols):
-                idx = y * self.cols + x
-                index = self.tile_pixels[idx]
-                rgb = self.palette_colors[index]
-                hex_color = self.rgb_to_hex(rgb)
-
-                x1 = self.offset_x + x * self.cell_size
-                y1 = self.offset_y + y * self.cell_size
-                x2 = x1 + self.cell_size
-                y2 = y1 + self.cell_size
-
-                self.canvas.create_rectangle(
-                    x1, y1, x2, y2,
-                    outline='red',
-                    fill=hex_color
-                )
-                text_color = self.best_contrast_bw(rgb)
-                self.canvas.create_text(
-                    x1 + self.cell_size // 2,
-                    y1 + self.cell_size // 2,
-                    text=f"{index:X}",
-                    font=("Courier", int(self.cell_size * 0.4)),
-                    fill=text_color
-                )
+        font = ("Courier", int(self.cell_size * 0.4))
+        if not self.cell_items:
+            for _ in range(self.rows * self.cols):
+                rect = self.canvas.create_rectangle(0, 0, 0, 0, outline='red')
+                text = self.canvas.create_text(0, 0, font=font)
+                self.cell_items.append((rect, text))
+            self._shown = [None] * len(self.cell_items)
+        else:
+            for _, text in self.cell_items:
+                self.canvas.itemconfig(text, font=font)
+
+        for idx, (rect, text) in enumerate(self.cell_items):
+            x1 = self.offset_x + idx % self.cols * self.cell_size
+            y1 = self.offset_y + idx // self.cols * self.cell_size
+            self.canvas.coords(rect, x1, y1, x1 + self.cell_size, y1 + self.cell_size)
+            self.canvas.coords(text, x1 + self.cell_size // 2, y1 + self.cell_size // 2)
+        self.refresh_cells()
+
+    def refresh_cells(self):
+        """Reconfigure only the cells whose pixel value differs from what they show"""
+        if not self.cell_items:
+            self.redraw_grid()  # Lays out the grid, then calls back here
+            return
+        tile_pixels = self.tile_pixels
+        shown = self._shown
+        for idx, (rect, text) in enumerate(self.cell_items):
+            index = tile_pixels[idx]
+            if shown[idx] == index:
+                continue
+            shown[idx] = index
+            self.canvas.itemconfig(rect, fill=self._hex_colors[index])
+            self.canvas.itemconfig(text, text=f"{index:X}",
+                                   fill=self.best_contrast_bw(self.palette_colors[index]))
 
     def rgb_to_hex(self, rgb):
         return "#{:02X}{:02X}{:02X}".format(*rgb)
\ No newline at end of file
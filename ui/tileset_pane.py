@@ -1,23 +1,34 @@
 import tkinter as tk
 
+from ui.render_cache import RenderCache
+from ui.tile_renderer import hex_colors, render_tile
+
 class TilesetPane(tk.Frame):
-    TOTAL_TILES = 512
     TILE_SIZE = 8  # Original tile pixel size
     MIN_SCALE = 3
     MAX_SCALE = 6
 
-    def __init__(self, master, palette_pane=None, on_tile_selected=None):
+    def __init__(self, master, tileset, palette_pane=None, on_tile_selected=None, render_cache=None,
+                 updates=None):
         super().__init__(master)
         self.on_tile_selected = on_tile_selected
         self.palette_pane = palette_pane
         self.active_tile_index = 0
-        self.tiles_data = [[0]*64 for _ in range(self.TOTAL_TILES)]
+        self.tileset = tileset  # Shared model.tileset.Tileset
+        (updates or tileset).add_listener(self)  # Optionally coalesced by an UpdateScheduler
         self.bg = 'white'
         self.scale = 4
         self.tiles_per_row = 8
         
         # Initialize palette colors with default
         self.palette_colors = [(0, 0, 0)] * 16  # Default 16-color palette
+        self._palette_version = 0
+        self._hex_colors = None
+        self.render_cache = render_cache if render_cache is not None else RenderCache()
+        self.tile_items = {}  # Tile index -> (border, label, image) items, only for rows in view
+        self._image_refs = {}  # Tile index -> PhotoImage shown by its item
+        self.selection_item = None
+        self._rows = None  # (first, last) row range currently realized
         
         self.label = tk.Label(self, text="Tileset", font=("Arial", 12, "bold"))
         self.label.pack(side="top", pady=4)
@@ -27,7 +38,7 @@ class TilesetPane(tk.Frame):
 
         self.canvas = tk.Canvas(canvas_wrapper, bg='white')
         self.scrollbar = tk.Scrollbar(canvas_wrapper, orient='vertical', command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.configure(yscrollcommand=self.on_yscroll)
 
         self.scrollbar.pack(side='right', fill='y')
         self.canvas.pack(side='left', fill='both', expand=True)
@@ -39,11 +50,13 @@ class TilesetPane(tk.Frame):
         self.update_zoom_layout()
 
     def set_palette(self, palette_colors):
-        """Update the palette and redraw all tiles with new colors"""
+        """Update the palette and re-render the realized tiles with new colors"""
         if palette_colors is None or len(palette_colors) == 0:
             return
             
         self.palette_colors = palette_colors
+        self._palette_version += 1  # Images cached for older palettes can no longer hit
+        self._hex_colors = None
         
         # Update background color based on palette[0]
         try:
@@ -52,88 +65,123 @@ class TilesetPane(tk.Frame):
             self.canvas.configure(bg=base_color_hex)
         except (IndexError, AttributeError):
             pass
-            
-        self.draw_tiles()
+
+        text_color = self.label_color()
+        for index, (_, label, _) in self.tile_items.items():
+            self.canvas.itemconfig(label, fill=text_color)
+            self.update_tile(index)
         
     def set_active_color_index(self, index):
         """Currently not used, but kept for interface compatibility"""
         pass
 
+    def label_color(self):
+        """Index label color with the best contrast against palette[0]"""
+        return self.best_contrast_bw(self.palette_colors[0]) if self.palette_colors else 'black'
+
+    def tile_image(self, index):
+        """Return a tile's image from the shared render cache, rendering it on a miss"""
+        scale = self.scale
+        key = ("set", scale, self._palette_version)
+        img = self.render_cache.get(index, key)
+        if img is None:
+            if self._hex_colors is None:
+                self._hex_colors = hex_colors(self.palette_colors)
+            img = render_tile(self.tileset.tile_view(index), self._hex_colors, scale)
+            self.render_cache.put(index, key, img)
+        return img
+
     def draw_tiles(self):
-        """Redraw all tiles with current palette and tileset data"""
+        """Recreate the realized rows and the selection overlay (after zoom or layout changes)"""
         self.canvas.delete("all")
+        self.tile_items = {}
+        self._image_refs = {}
+        self._rows = None
+
         tile_w = self.TILE_SIZE * self.scale
-        tile_h = tile_w
-        tiles_per_row = self.tiles_per_row
-        
-        # Determine text color based on background
-        text_color = self.best_contrast_bw(self.palette_colors[0]) if self.palette_colors else 'black'
-        
-        for index in range(self.TOTAL_TILES):
-            col = index % tiles_per_row
-            row = index // tiles_per_row
-            x = col * tile_w
-            y = row * tile_h
-            
-            # Draw tile background and index text
-            self.canvas.create_rectangle(x, y, x + tile_w, y + tile_h, outline='gray')
-            self.canvas.create_text(
-                x + tile_w // 2,
-                y + tile_h // 2,
-                text=f"{index:03X}",
-                font=('Courier', max(8, int(8 * self.scale * 0.25))),
-                fill=text_color
-            )
-
-            # Draw pixel overlay if tile not all zero
-            pixels = self.tiles_data[index]
-            if any(pixel != 0 for pixel in pixels) and self.palette_colors:
-                pixel_size = max(1, tile_w // 8)
-                for i, color_index in enumerate(pixels):
-                    px = i % 8
-                    py = i // 8
-
-                    # Safely get color from palette
-                    if 0 <= color_index < len(self.palette_colors):
-                        color = self.palette_colors[color_index]
-                        color_hex = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
-                    else:
-                        color_hex = "#FF00FF"  # Magenta for invalid indices
-
-                    self.canvas.create_rectangle(
-                        x + px * pixel_size,
-                        y + py * pixel_size,
-                        x + (px + 1) * pixel_size,
-                        y + (py + 1) * pixel_size,
-                        fill=color_hex,
-                        outline=""
-                    )
-
-            # Highlight active tile
-            if index == self.active_tile_index:
-                self.canvas.create_rectangle(x, y, x + tile_w, y + tile_h, outline='red', width=2)
-
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
-
-    def update_tileset(self, tiles_data):
-        """Update the entire tileset data and redraw"""
-        if tiles_data is None or len(tiles_data) != self.TOTAL_TILES:
+        rows = (len(self.tileset) + self.tiles_per_row - 1) // self.tiles_per_row
+        self.canvas.config(scrollregion=(0, 0, self.tiles_per_row * tile_w, rows * tile_w))
+        self.selection_item = self.canvas.create_rectangle(0, 0, 0, 0, outline='red', width=2, tags='selection')
+        self.move_selection()
+        self.update_viewport()
+
+    def visible_rows(self):
+        """Row range (first, last) covering the visible canvas area plus one row of margin"""
+        tile_h = self.TILE_SIZE * self.scale
+        rows = (len(self.tileset) + self.tiles_per_row - 1) // self.tiles_per_row
+        first = int(self.canvas.canvasy(0)) // tile_h
+        last = int(self.canvas.canvasy(self.canvas.winfo_height())) // tile_h + 1
+        return max(0, first - 1), min(rows, last + 1)
+
+    def update_viewport(self):
+        """Realize items for tiles entering the view, recycling those of tiles that left it"""
+        rows = self.visible_rows()
+        if rows == self._rows:
             return
-            
-        self.tiles_data = tiles_data
-        self.draw_tiles()
+        self._rows = rows
+        first, last = rows
+        tile_w = self.TILE_SIZE * self.scale
+        tiles_per_row = self.tiles_per_row
 
-    def update_tile(self, tile_index, tile_data):
-        """Update a single tile and redraw if visible"""
-        if 0 <= tile_index < self.TOTAL_TILES:
-            self.tiles_data[tile_index] = tile_data
-            # Only redraw if this tile is currently visible
-            visible_start = int(self.canvas.canvasy(0) // (self.TILE_SIZE * self.scale))
-            visible_end = visible_start + (self.canvas.winfo_height() // (self.TILE_SIZE * self.scale)) + 1
-            
-            row = tile_index // self.tiles_per_row
-            if visible_start <= row <= visible_end:
-                self.draw_tiles()
+        wanted = range(first * tiles_per_row, min(len(self.tileset), last * tiles_per_row))
+        stale = [index for index in self.tile_items if index not in wanted]
+        for index in stale:
+            self._image_refs.pop(index, None)
+        stale_items = [self.tile_items.pop(index) for index in stale]
+
+        text_color = self.label_color()
+        font = ('Courier', max(8, int(8 * self.scale * 0.25)))
+        for index in wanted:
+            if index in self.tile_items:
+                continue
+            x = index % tiles_per_row * tile_w
+            y = index // tiles_per_row * tile_w
+            if stale_items:
+                items = border, label, image = stale_items.pop()
+                self.canvas.coords(border, x, y, x + tile_w, y + tile_w)
+                self.canvas.coords(label, x + tile_w // 2, y + tile_w // 2)
+                self.canvas.itemconfig(label, text=f"{index:03X}")
+                self.canvas.coords(image, x, y)
+            else:
+                items = (
+                    self.canvas.create_rectangle(x, y, x + tile_w, y + tile_w, outline='gray'),
+                    self.canvas.create_text(x + tile_w // 2, y + tile_w // 2, text=f"{index:03X}",
+                                            font=font, fill=text_color),
+                    self.canvas.create_image(x, y, anchor='nw'),
+                )
+            self.tile_items[index] = items
+            self.update_tile(index)
+        for items in stale_items:
+            self.canvas.delete(*items)
+
+        self.canvas.tag_raise('selection')
+
+    def move_selection(self):
+        """Move the selection overlay onto the active tile"""
+        tile_w = self.TILE_SIZE * self.scale
+        x = self.active_tile_index % self.tiles_per_row * tile_w
+        y = self.active_tile_index // self.tiles_per_row * tile_w
+        self.canvas.coords(self.selection_item, x, y, x + tile_w, y + tile_w)
+
+    def on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.update_viewport()
+
+    def on_tiles_changed(self, indices):
+        """Re-render the changed tiles when the tileset model changes"""
+        for index in indices:
+            self.render_cache.evict_tile(index)
+            self.update_tile(index)
+
+    def update_tile(self, tile_index):
+        """Show a tile's current image if its row is realized; empty tiles show their label"""
+        items = self.tile_items.get(tile_index)
+        if items is None:
+            return  # Outside the view, rendered when scrolled into view
+        img = None if self.tileset.is_empty(tile_index) else self.tile_image(tile_index)
+        if self._image_refs.get(tile_index) is not img:
+            self.canvas.itemconfig(items[2], image=img if img is not None else '')
+            self._image_refs[tile_index] = img
 
     def on_palette_changed(self, palette):
         """Handle palette updates from palette pane"""
@@ -152,11 +200,11 @@ class TilesetPane(tk.Frame):
 
         index = row * self.tiles_per_row + col
 
-        if 0 <= index < self.TOTAL_TILES:
+        if 0 <= index < len(self.tileset) and col < self.tiles_per_row and index != self.active_tile_index:
             self.active_tile_index = index
+            self.move_selection()
             if self.on_tile_selected:
-                self.on_tile_selected(index, self.tiles_data[index])
-            self.draw_tiles()
+                self.on_tile_selected(index)
 
     def update_zoom_layout(self):
         """Update layout when zoom level changes"""
@@ -173,6 +221,8 @@ class TilesetPane(tk.Frame):
         if new_tiles_per_row != self.tiles_per_row:
             self.tiles_per_row = new_tiles_per_row
             self.draw_tiles()
+        else:
+            self.update_viewport()  # Taller views realize more rows
 
     def zoom_in(self):
         """Zoom in (increase scale)"""
@@ -0,0 +1,103 @@
+import time
+
+from model.tilemap import ALL_CELLS
+
+
+class UpdateScheduler:
+    """Collects model change notifications and forwards them to views once per frame
+
+    Register it as a listener on the palette, tileset and tilemap models and
+    register views on it instead. Changes made during an input burst, such
+    as a paint stroke, are merged and delivered in one flush from a Tk
+    after() callback, so handlers never run more than once per frame.
+    """
+
+    FRAME_MS = 16
+
+    def __init__(self, widget, interval_ms=FRAME_MS, slow_flush_ms=FRAME_MS):
+        self.widget = widget  # Any Tk widget, used for after()
+        self.interval_ms = interval_ms
+        self.slow_flush_ms = slow_flush_ms  # Flushes slower than this are reported
+        self.listeners = []
+        self._palette = set()
+        self._tiles = set()
+        self._cells = set()
+        self._after_id = None
+        self.flushes = 0
+        self.notifications = 0  # Model notifications received, to compare against flushes
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def watch(self, *models):
+        """Listen to the given models"""
+        for model in models:
+            model.add_listener(self)
+
+    def add_listener(self, listener):
+        """Add a view to be notified on flush"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Remove a view from notification list"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def on_palette_entries_changed(self, indices):
+        self._palette.update(indices)
+        self._schedule()
+
+    def on_tiles_changed(self, indices):
+        self._tiles.update(indices)
+        self._schedule()
+
+    def on_cells_changed(self, cells):
+        if cells is ALL_CELLS:
+            self._cells = ALL_CELLS
+        elif self._cells is not ALL_CELLS:
+            self._cells.update(cells)
+        self._schedule()
+
+    def _schedule(self):
+        self.notifications += 1
+        if self._after_id is None:
+            if self.interval_ms:
+                self._after_id = self.widget.after(self.interval_ms, self.flush)
+            else:
+                self._after_id = self.widget.after_idle(self.flush)
+
+    def cancel(self):
+        """Drop the scheduled flush, keeping the pending changes"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def flush(self):
+        """Deliver pending changes now: palette first, then tiles, then map cells"""
+        self._after_id = None
+        palette, self._palette = self._palette, set()
+        tiles, self._tiles = self._tiles, set()
+        cells, self._cells = self._cells, set()
+        if not (palette or tiles or cells):
+            return
+
+        start = time.perf_counter()
+        if palette:
+            self._dispatch('on_palette_entries_changed', sorted(palette))
+        if tiles:
+            self._dispatch('on_tiles_changed', sorted(tiles))
+        if cells:
+            self._dispatch('on_cells_changed', cells if cells is ALL_CELLS else list(cells))
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.flushes += 1
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+        if elapsed > self.slow_flush_ms:
+            print(f"Slow view update: {elapsed:.1f} ms for {len(palette)} colors, {len(tiles)} tiles, "
+                  f"{'all' if cells is ALL_CELLS else len(cells)} cells")
+
+    def _dispatch(self, method, changes):
+        for listener in self.listeners:
+            if hasattr(listener, method):
+                getattr(listener, method)(changes)